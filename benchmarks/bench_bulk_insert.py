@@ -0,0 +1,124 @@
+"""Benchmark: per-row ORM inserts vs. multi-row bulk inserts for quiz writes.
+
+    DATABASE_URL=... python -m benchmarks.bench_bulk_insert [--sizes 10 50 200] [--repeat 20]
+
+Runs against the configured database. Everything is written inside a
+transaction that is rolled back, so no data is left behind. "orm" is the
+previous code path: one db.add() per row with ids from uuid4(), then
+db.refresh(session). "bulk" is what quiz_service does now.
+"""
+import argparse
+import time
+import uuid
+
+from sqlalchemy import event, insert
+
+from db import migrate
+from db.base import SessionLocal, engine
+from models.quiz_question import QuizQuestion
+from models.quiz_session import QuizSession
+from models.user import User
+from models.user_answer import UserAnswer
+from services.quiz_service import _question_row
+
+
+def _questions(count: int):
+    return [
+        {
+            "question": f"Question {i}?", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d",
+            "correct_option": "A", "explanation": "because",
+        }
+        for i in range(count)
+    ]
+
+
+def _orm_questions(db, session, questions):
+    for i, q in enumerate(questions):
+        db.add(QuizQuestion(id=uuid.uuid4(), **_question_row(session.id, q, i + 1)))
+    db.flush()
+    db.refresh(session)
+
+
+def _bulk_questions(db, session, questions):
+    db.execute(insert(QuizQuestion), [_question_row(session.id, q, i + 1) for i, q in enumerate(questions)])
+
+
+def _answer_rows(session, user, question_ids):
+    return [
+        {"session_id": session.id, "question_id": qid, "user_id": user.id, "selected_option": "A", "is_correct": True}
+        for qid in question_ids
+    ]
+
+
+def _orm_answers(db, session, user, question_ids):
+    for row in _answer_rows(session, user, question_ids):
+        db.add(UserAnswer(id=uuid.uuid4(), **row))
+    db.flush()
+    db.refresh(session)
+
+
+def _bulk_answers(db, session, user, question_ids):
+    db.execute(insert(UserAnswer), _answer_rows(session, user, question_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    migrate.upgrade()
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+
+    db = SessionLocal()
+    try:
+        name = f"bench-{uuid.uuid4().hex[:8]}"
+        user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+        db.add(user)
+        db.flush()
+
+        print(f"{'questions':>9}  {'path':<5}{'write':<10}{'stmts':>7}{'ms':>9}{'rows/s':>10}")
+        for size in args.sizes:
+            questions = _questions(size)
+            for label, write_questions, write_answers in (
+                ("orm", _orm_questions, _orm_answers),
+                ("bulk", _bulk_questions, _bulk_answers),
+            ):
+                totals = {"questions": [0, 0.0], "answers": [0, 0.0]}
+                for _ in range(args.repeat):
+                    session = QuizSession(
+                        user_id=user.id, title="bench", num_questions=size, time_limit_seconds=600,
+                        total_questions=size, status="pending",
+                    )
+                    db.add(session)
+                    db.flush()
+
+                    statements, started = 0, time.perf_counter()
+                    write_questions(db, session, questions)
+                    totals["questions"][0] += statements
+                    totals["questions"][1] += time.perf_counter() - started
+
+                    question_ids = list(db.scalars(
+                        QuizQuestion.__table__.select().with_only_columns(QuizQuestion.id)
+                        .where(QuizQuestion.session_id == session.id)
+                    ))
+                    statements, started = 0, time.perf_counter()
+                    write_answers(db, session, user, question_ids)
+                    totals["answers"][0] += statements
+                    totals["answers"][1] += time.perf_counter() - started
+
+                for write, (count, seconds) in totals.items():
+                    print(f"{size:>9}  {label:<5}{write:<10}{count / args.repeat:>7.0f}"
+                          f"{seconds / args.repeat * 1000:>9.2f}{size * args.repeat / seconds:>10.0f}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
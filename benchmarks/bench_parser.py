@@ -0,0 +1,82 @@
+"""Microbenchmark: tolerant question parser vs. the previous regex + json.loads path.
+
+Runs both over every file in benchmarks/parser_corpus (real-world shapes of
+bad model output) and prints questions recovered and time per parse (best
+of five runs).
+
+    python -m benchmarks.bench_parser [--repeat 2000]
+"""
+import argparse
+import json
+import re
+import timeit
+from pathlib import Path
+
+from services.question_parser import parse_questions, validate_question
+
+CORPUS = Path(__file__).parent / "parser_corpus"
+LIMIT = 10
+
+
+def legacy_parse(raw_response: str, num_questions: int) -> list:
+    """The pre-existing ai_service._parse_questions, kept verbatim for comparison."""
+    text = raw_response.strip()
+    text = re.sub(r"```json\s*", "", text)
+    text = re.sub(r"```\s*", "", text)
+    text = text.strip()
+
+    start = text.find("[")
+    end = text.rfind("]") + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON array found in model response")
+
+    questions = json.loads(text[start:end])
+    if not isinstance(questions, list):
+        raise ValueError("Expected a JSON array")
+
+    validated = []
+    for q in questions:
+        question = validate_question(q)
+        if question:
+            validated.append(question)
+        if len(validated) == num_questions:
+            break
+    return validated
+
+
+def _legacy_count(text: str) -> int:
+    try:
+        return len(legacy_parse(text, LIMIT))
+    except ValueError:
+        return 0
+
+
+def _per_call_us(fn, text: str, repeat: int) -> float:
+    # Best of five runs, so a noisy machine doesn't swing the comparison
+    return min(timeit.repeat(lambda: fn(text), number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'corpus file':<40}{'legacy q':>9}{'new q':>7}{'legacy us':>11}{'new us':>9}  dropped")
+    totals = [0, 0, 0.0, 0.0]
+    for path in sorted(CORPUS.glob("*.txt")):
+        text = path.read_text()
+        report = parse_questions(text, LIMIT)
+        legacy_us = _per_call_us(_legacy_count, text, args.repeat)
+        new_us = _per_call_us(lambda t: parse_questions(t, LIMIT), text, args.repeat)
+        legacy_found = _legacy_count(text)
+        dropped = ", ".join(f"{reason}={n}" for reason, n in report.dropped.items()) or "-"
+        print(f"{path.name:<40}{legacy_found:>9}{len(report.questions):>7}{legacy_us:>11.1f}{new_us:>9.1f}  {dropped}")
+        totals[0] += legacy_found
+        totals[1] += len(report.questions)
+        totals[2] += legacy_us
+        totals[3] += new_us
+    print(f"{'total':<40}{totals[0]:>9}{totals[1]:>7}{totals[2]:>11.1f}{totals[3]:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
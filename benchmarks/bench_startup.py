@@ -0,0 +1,121 @@
+"""Benchmark: extraction worker cold start, native backends vs. LangChain loaders.
+
+    python -m benchmarks.bench_startup sample.pdf sample.docx scan.png [--workers 4]
+
+Each backend set runs in a fresh interpreter that imports what an extraction
+worker needs and extracts every sample once; we report time to import, time
+to finish the samples, and RSS. It then starts the real pool and measures
+how long until every worker has answered a job, and the workers' total RSS.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HOLD_SECONDS = 1.0
+SOURCE_TYPES = {".pdf": "pdf", ".docx": "docx", ".png": "image", ".jpg": "image", ".jpeg": "image"}
+
+
+def _rss_mb(pid="self") -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _child(mode: str, files):
+    """Runs in a fresh interpreter; prints one JSON line."""
+    import resource
+
+    started = time.perf_counter()
+    if mode == "langchain":
+        from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, UnstructuredImageLoader
+        loaders = {"pdf": PyPDFLoader, "docx": Docx2txtLoader, "image": UnstructuredImageLoader}
+
+        def extract(source_type, path):
+            return "\n\n".join(doc.page_content for doc in loaders[source_type](path).load())
+    else:
+        from services.extraction import extract_text as extract
+    imported = time.perf_counter()
+
+    errors = []
+    for path in files:
+        try:
+            extract(SOURCE_TYPES[Path(path).suffix.lower()], path)
+        except Exception as e:
+            errors.append(f"{Path(path).name}: {type(e).__name__}: {e}")
+    done = time.perf_counter()
+    print(json.dumps({
+        "import_seconds": imported - started,
+        "total_seconds": done - started,
+        "rss_mb": _rss_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "modules": len(sys.modules),
+        "errors": errors,
+    }))
+
+
+def _measure(mode: str, files):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, *files],
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1:]
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats["wall_seconds"] = wall
+    return stats, stats["errors"]
+
+
+async def _pool(workers: int):
+    from core.config import settings
+    from services import extraction
+
+    settings.EXTRACT_WORKERS = workers
+    started = time.perf_counter()
+    extraction.start()
+    try:
+        # One job per worker, each long enough that no worker can take two,
+        # so every process has to spawn and import before the batch returns
+        await asyncio.gather(*(extraction._submit(None, time.sleep, HOLD_SECONDS) for _ in range(extraction._workers)))
+        ready = time.perf_counter() - started - HOLD_SECONDS
+        pids = [pid for pid in extraction._pids_shared if pid]
+        return ready, len(pids), sum(_rss_mb(pid) for pid in pids)
+    finally:
+        extraction.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", choices=["native", "langchain"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.files)
+        return
+
+    print(f"{'backends':<12}{'import s':>10}{'extracted s':>13}{'process s':>11}{'RSS MB':>9}{'peak MB':>9}{'modules':>9}")
+    for mode in ("langchain", "native"):
+        stats, errors = _measure(mode, args.files)
+        if stats is None:
+            print(f"{mode:<12} failed: {' '.join(errors)}")
+            continue
+        print(f"{mode:<12}{stats['import_seconds']:>10.2f}{stats["total_seconds"]:>13.2f}{stats['wall_seconds']:>11.2f}"
+              f"{stats['rss_mb']:>9.0f}{stats['peak_rss_mb']:>9.0f}{stats['modules']:>9}")
+        for error in errors:
+            print(f"{'':<12}  ! {error}")
+
+    ready, count, rss = asyncio.run(_pool(args.workers))
+    print(f"\nExtraction pool: {count} workers ready in {ready:.2f}s, {rss:.0f} MB RSS total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Check that the attempt, review, dashboard and history pages stay within
+their query budgets.
+
+    DATABASE_URL=... python -m benchmarks.check_query_counts
+
+Creates a throwaway user with a 20-question quiz directly in the database
+(no LLM needed), walks it through attempt -> submit -> review, renders the
+dashboard and history, and exits non-zero if any page runs more statements
+than its budget. Budgets include the user lookup done by every page; they
+must not grow with the number of questions or quizzes.
+"""
+import sys
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from db.base import SessionLocal
+from db.query_counter import assert_max_queries
+from models.quiz_question import QuizQuestion
+from models.quiz_session import QuizSession
+from models.user import User
+from services import quiz_service, stats_service
+
+NUM_QUESTIONS = 20
+
+BUDGETS = {
+    "attempt": 4,  # user, session, questions, start UPDATE
+    "submit": 7,  # user, session, questions, answers INSERT, stats upsert, session + stats UPDATE
+    "review": 3,  # user, session, questions joined with answers
+    "dashboard": 3,  # user, recent sessions, user_stats row
+    "history": 3,  # user, page, user_stats row (no count: the total is maintained)
+    "history_next": 3,  # same for a page reached by cursor
+}
+
+
+def _create_quiz(user_id) -> str:
+    db = SessionLocal()
+    try:
+        session = QuizSession(
+            user_id=user_id, title="Query budget check", num_questions=NUM_QUESTIONS,
+            time_limit_seconds=600, total_questions=NUM_QUESTIONS, status="pending",
+        )
+        db.add(session)
+        db.flush()
+        db.execute(insert(QuizQuestion), [
+            {
+                "session_id": session.id, "question_text": f"Question {i}?", "option_a": "a", "option_b": "b",
+                "option_c": "c", "option_d": "d", "correct_option": "A", "explanation": "", "order_index": i + 1,
+            }
+            for i in range(NUM_QUESTIONS)
+        ])
+        stats_service.count_quiz(db, user_id)
+        db.commit()
+        return str(session.id)
+    finally:
+        db.close()
+
+
+def _check(name: str, request):
+    try:
+        with assert_max_queries(BUDGETS[name]) as counter:
+            response = request()
+    except AssertionError as e:
+        print(f"FAIL {name}: {e}")
+        return False
+    if response.status_code >= 400:
+        print(f"FAIL {name}: HTTP {response.status_code}")
+        return False
+    print(f"ok   {name:<12} {counter.count}/{BUDGETS[name]} queries")
+    return True
+
+
+def main() -> int:
+    import main as app
+
+    with TestClient(app.app) as client:
+        name = f"qc{int(time.time() * 1000)}"
+        client.post("/auth/register", data={"email": f"{name}@example.com", "username": name, "password": "password1"})
+        client.post("/auth/login", data={"email": f"{name}@example.com", "password": "password1"})
+        db = SessionLocal()
+        user_id = db.query(User.id).filter(User.username == name).scalar()
+        db.close()
+        session_id = _create_quiz(user_id)
+
+        db = SessionLocal()
+        question_ids = [str(q) for q, in db.query(QuizQuestion.id).filter(QuizQuestion.session_id == session_id)]
+        cursor = quiz_service.encode_cursor(db.get(QuizSession, session_id))
+        db.close()
+        answers = [{"question_id": q, "selected_option": "A"} for q in question_ids]
+
+        results = [
+            _check("attempt", lambda: client.get(f"/quiz/{session_id}/attempt")),
+            _check("submit", lambda: client.post(
+                f"/quiz/{session_id}/submit", json={"answers": answers, "time_taken_seconds": 30},
+            )),
+            _check("review", lambda: client.get(f"/quiz/{session_id}/review")),
+            _check("dashboard", lambda: client.get("/dashboard")),
+            _check("history", lambda: client.get("/profile/")),
+            _check("history_next", lambda: client.get(f"/profile/?after={cursor}&page=2")),
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
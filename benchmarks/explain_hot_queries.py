@@ -0,0 +1,202 @@
+"""Check that the hot queries keep index plans on a large data set.
+
+    DATABASE_URL=... python -m benchmarks.explain_hot_queries [--users 1000] [--sessions-per-user 100] [--questions 10]
+
+Applies the migrations, seeds users x sessions x questions (and one answer
+per question of every completed session) with generate_series, plus one
+power user with --power-sessions more quizzes for deep history pages, runs
+VACUUM ANALYZE, then runs EXPLAIN (ANALYZE, BUFFERS) on the queries behind
+the dashboard, history (first page and page 500), attempt, submit and review
+pages. Exits non-zero if a plan scans a whole hot table, if a paged query
+sorts instead of reading its index in order, or if a query that should be
+answered from an index alone touches the heap. The defaults seed about 1.9M
+rows; the seeded users (and, by cascade, everything else) are deleted
+afterwards unless --keep is given. Use a scratch database.
+"""
+import argparse
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+
+from db import migrate
+from db.base import engine
+
+HOT_TABLES = {"quiz_sessions", "quiz_questions", "user_answers", "study_sources"}
+
+# name -> (SQL mirroring the ORM query, tables that must be read index-only,
+#          whether rows must come out of the index already in order).
+# Paged queries must not sort: a Sort reads every matching row before the
+# LIMIT applies. Sorting one session's handful of questions is fine.
+QUERIES = {
+    "dashboard_recent": (
+        "SELECT * FROM quiz_sessions WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 5",
+        set(), True,
+    ),
+    "history_first_page": (
+        "SELECT * FROM quiz_sessions WHERE user_id = :power_user_id ORDER BY created_at DESC, id LIMIT 11",
+        set(), True,
+    ),
+    "history_deep_page": (
+        "SELECT * FROM quiz_sessions WHERE user_id = :power_user_id AND created_at <= :cursor_created_at "
+        "AND (created_at < :cursor_created_at OR id > :cursor_id) ORDER BY created_at DESC, id LIMIT 11",
+        set(), True,
+    ),
+    "session_lookup": (
+        "SELECT * FROM quiz_sessions WHERE id = :session_id AND user_id = :user_id",
+        set(), False,
+    ),
+    "attempt_questions": (
+        "SELECT id, session_id, question_text, option_a, option_b, option_c, option_d, order_index "
+        "FROM quiz_questions WHERE session_id = :session_id ORDER BY order_index",
+        set(), False,
+    ),
+    "submit_grading": (
+        "SELECT id, correct_option FROM quiz_questions WHERE session_id = :session_id",
+        set(), False,
+    ),
+    "review": (
+        "SELECT q.*, a.selected_option, a.is_correct FROM quiz_questions q "
+        "LEFT OUTER JOIN user_answers a ON a.question_id = q.id AND a.session_id = q.session_id "
+        "WHERE q.session_id = :session_id ORDER BY q.order_index",
+        {"user_answers"}, False,
+    ),
+}
+
+
+def _seed(conn, tag: str, users: int, sessions: int, questions: int, power_sessions: int):
+    seeded = "SELECT id FROM users WHERE email LIKE :pattern"
+    params = {"tag": tag, "pattern": f"explain-{tag}-%"}
+    conn.execute(text(
+        "INSERT INTO users (id, email, username, hashed_password, is_active) "
+        "SELECT gen_random_uuid(), 'explain-' || :tag || '-' || g || '@example.com', "
+        "'explain-' || :tag || '-' || g, 'x', true FROM generate_series(1, :users) g"
+    ), {**params, "users": users})
+    conn.execute(text(
+        "INSERT INTO quiz_sessions (id, user_id, title, num_questions, difficulty, time_limit_seconds, "
+        "total_questions, score, percentage, status, created_at) "
+        "SELECT gen_random_uuid(), u.id, 'Explain', :questions, 'medium', 600, :questions, "
+        "CASE WHEN g % 5 = 0 THEN NULL ELSE (random() * :questions)::int END, "
+        "CASE WHEN g % 5 = 0 THEN NULL ELSE (random() * 100)::numeric(5, 2) END, "
+        "CASE WHEN g % 5 = 0 THEN 'pending' ELSE 'completed' END, "
+        "now() - g * interval '1 hour' "
+        f"FROM ({seeded}) u CROSS JOIN generate_series(1, :sessions) g"
+    ), {**params, "sessions": sessions, "questions": questions})
+    conn.execute(text(
+        "INSERT INTO quiz_questions (session_id, question_text, option_a, option_b, option_c, option_d, "
+        "correct_option, explanation, order_index) "
+        "SELECT s.id, 'Question ' || g || '?', 'a', 'b', 'c', 'd', 'A', 'Because.', g "
+        f"FROM quiz_sessions s CROSS JOIN generate_series(1, :questions) g WHERE s.user_id IN ({seeded})"
+    ), {**params, "questions": questions})
+    conn.execute(text(
+        "INSERT INTO user_answers (session_id, question_id, user_id, selected_option, is_correct) "
+        "SELECT q.session_id, q.id, s.user_id, 'A', true "
+        "FROM quiz_questions q JOIN quiz_sessions s ON s.id = q.session_id "
+        f"WHERE s.status = 'completed' AND s.user_id IN ({seeded})"
+    ), params)
+    # The first user is a power user with a long history (sessions only)
+    conn.execute(text(
+        "INSERT INTO quiz_sessions (id, user_id, title, num_questions, difficulty, time_limit_seconds, "
+        "total_questions, score, percentage, status, created_at) "
+        "SELECT gen_random_uuid(), u.id, 'Explain', 10, 'medium', 600, 10, 5, 50, 'completed', "
+        "now() - (:sessions + g) * interval '1 hour' "
+        "FROM users u CROSS JOIN generate_series(1, :power_sessions) g WHERE u.email = :email"
+    ), {"sessions": sessions, "power_sessions": power_sessions, "email": f"explain-{tag}-1@example.com"})
+    conn.commit()
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _check(plan, index_only: set, ordered: bool) -> list[str]:
+    problems = []
+    nodes = list(_walk(plan["Plan"]))
+    for node in nodes:
+        table = node.get("Relation Name")
+        if node["Node Type"] == "Seq Scan" and table in HOT_TABLES:
+            problems.append(f"Seq Scan on {table}")
+        if ordered and node["Node Type"] in ("Sort", "Incremental Sort"):
+            problems.append(f"{node['Node Type']} on {node.get('Sort Key')}")
+        if table in index_only:
+            if node["Node Type"] != "Index Only Scan":
+                problems.append(f"{node['Node Type']} on {table}, expected Index Only Scan")
+            elif node.get("Heap Fetches"):
+                problems.append(f"{node['Heap Fetches']} heap fetches on {table}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--sessions-per-user", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--power-sessions", type=int, default=5000, help="extra history for the first user")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in place")
+    args = parser.parse_args()
+
+    migrate.upgrade()
+    tag = uuid.uuid4().hex[:8]
+    failed = False
+    try:
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            _seed(conn, tag, args.users, args.sessions_per_user, args.questions, args.power_sessions)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE users, quiz_sessions, quiz_questions, user_answers"))
+            counts = {
+                table: conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+                for table in ("quiz_sessions", "quiz_questions", "user_answers")
+            }
+        print(f"Seeded and analyzed in {time.perf_counter() - started:.1f}s: "
+              + ", ".join(f"{table} {count:,}" for table, count in counts.items()))
+
+        with engine.connect() as conn:
+            user_id = conn.execute(text(
+                "SELECT id FROM users WHERE email = :email"
+            ), {"email": f"explain-{tag}-{args.users // 2 + 1}@example.com"}).scalar()
+            session_id = conn.execute(text(
+                "SELECT id FROM quiz_sessions WHERE user_id = :user_id AND status = 'completed' LIMIT 1"
+            ), {"user_id": user_id}).scalar()
+            power_user_id = conn.execute(text(
+                "SELECT id FROM users WHERE email = :email"
+            ), {"email": f"explain-{tag}-1@example.com"}).scalar()
+            # Cursor for page 500, or the middle of the power user's history
+            offset = min(4990, (args.sessions_per_user + args.power_sessions) // 2)
+            cursor_created_at, cursor_id = conn.execute(text(
+                "SELECT created_at, id FROM quiz_sessions WHERE user_id = :user_id "
+                "ORDER BY created_at DESC, id OFFSET :offset LIMIT 1"
+            ), {"user_id": power_user_id, "offset": offset}).one()
+            params = {
+                "user_id": user_id, "session_id": session_id, "power_user_id": power_user_id,
+                "cursor_created_at": cursor_created_at, "cursor_id": cursor_id,
+            }
+
+            print(f"\n{'query':<20}{'ms':>8}{'hit':>7}{'read':>7}  scans / problems")
+            for name, (sql, index_only, ordered) in QUERIES.items():
+                plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar()[0]
+                root = plan["Plan"]
+                problems = _check(plan, index_only, ordered)
+                failed = failed or bool(problems)
+                scans = [
+                    f"{node['Node Type']} {node.get('Index Name') or node['Relation Name']}"
+                    for node in _walk(root) if "Relation Name" in node or "Index Name" in node
+                ]
+                print(f"{name:<20}{plan['Execution Time']:>8.3f}{root.get('Shared Hit Blocks', 0):>7}"
+                      f"{root.get('Shared Read Blocks', 0):>7}  {'; '.join(problems) or ', '.join(scans)}")
+            conn.rollback()
+    finally:
+        if not args.keep:
+            with engine.connect() as conn:
+                conn.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": f"explain-{tag}-%"})
+                conn.commit()
+
+    print("\nFAIL" if failed else "\nOK: every hot query uses its index")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
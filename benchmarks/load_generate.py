@@ -0,0 +1,203 @@
+"""End-to-end load benchmark for the generate -> attempt -> submit path.
+
+Each virtual user registers, logs in, creates a topic source and then loops
+POST /quiz/generate, GET /quiz/{id}/attempt, POST /quiz/{id}/submit until
+the run ends. Reports throughput, p50/p95/p99 per step and how saturated
+the DB connection pool got (sampled from /metrics, when the app has a
+METRICS_TOKEN and it is passed with --metrics-token).
+
+Runs fully offline: start benchmarks.mock_llm, point the app at it with
+HF_API_URL and a local Postgres DATABASE_URL, then
+
+    python -m benchmarks.load_generate --base-url http://127.0.0.1:8000 --concurrency 20 --duration 60
+
+By default every quiz is generated with force_refresh, so the generation
+cache and question pool are bypassed and each iteration reaches the LLM.
+Pass --allow-cache to measure the cached/pooled path instead.
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+_QUESTIONS_JSON = re.compile(r"const QUESTIONS = (\[.*?\]);", re.S)
+_SESSION_URL = re.compile(r"/quiz/([0-9a-f-]{36})/attempt")
+_SOURCE_ID = re.compile(r"source_id=([0-9a-f-]{36})")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+
+    def ok(self, step: str, seconds: float):
+        self.latencies[step].append(seconds)
+
+    def fail(self, step: str, reason: str):
+        self.errors[f"{step}: {reason}"] += 1
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _timed(recorder: Recorder, step: str, request) -> httpx.Response:
+    started = time.perf_counter()
+    response = await request
+    recorder.ok(step, time.perf_counter() - started)
+    return response
+
+
+async def _sign_up(client: httpx.AsyncClient, topic: str) -> str:
+    """Register and log in a fresh user; returns the id of their topic source."""
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    password = "bench-password-1"
+    await client.post("/auth/register", data={"email": f"{name}@example.com", "username": name, "password": password})
+    response = await client.post("/auth/login", data={"email": f"{name}@example.com", "password": password})
+    if "access_token" not in client.cookies:
+        raise RuntimeError(f"login failed with HTTP {response.status_code}")
+    response = await client.post("/sources/topic", data={"topic": topic})
+    match = _SOURCE_ID.search(response.headers.get("location", ""))
+    if not match:
+        raise RuntimeError(f"creating topic source failed with HTTP {response.status_code}")
+    return match.group(1)
+
+
+async def _iteration(client: httpx.AsyncClient, recorder: Recorder, source_id: str, args) -> None:
+    form = {
+        "source_id": source_id,
+        "num_questions": str(args.num_questions),
+        "difficulty": args.difficulty,
+        "time_limit_seconds": "300",
+    }
+    if not args.allow_cache:
+        form["force_refresh"] = "true"
+    response = await _timed(recorder, "generate", client.post("/quiz/generate", data=form))
+    match = _SESSION_URL.search(response.headers.get("location", ""))
+    if response.status_code != 302 or not match:
+        recorder.fail("generate", f"HTTP {response.status_code}")
+        return
+    session_id = match.group(1)
+
+    response = await _timed(recorder, "attempt", client.get(f"/quiz/{session_id}/attempt"))
+    found = _QUESTIONS_JSON.search(response.text)
+    if response.status_code != 200 or not found:
+        recorder.fail("attempt", f"HTTP {response.status_code}")
+        return
+    answers = [{"question_id": q["id"], "selected_option": "A"} for q in json.loads(found.group(1))]
+
+    response = await _timed(recorder, "submit", client.post(
+        f"/quiz/{session_id}/submit", json={"answers": answers, "time_taken_seconds": 30},
+    ))
+    if response.status_code != 200 or "redirect" not in response.json():
+        recorder.fail("submit", f"HTTP {response.status_code}")
+        return
+    recorder.completed += 1
+
+
+async def _virtual_user(args, recorder: Recorder, deadline: float, timeout: httpx.Timeout):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+        try:
+            source_id = await _sign_up(client, args.topic)
+        except (RuntimeError, httpx.HTTPError) as e:
+            recorder.fail("setup", str(e))
+            return
+        while time.monotonic() < deadline:
+            try:
+                await _iteration(client, recorder, source_id, args)
+            except httpx.HTTPError as e:
+                recorder.fail("transport", type(e).__name__)
+
+
+async def _sample_pool(base_url: str, token: str, samples: List[dict], stop: asyncio.Event):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, timeout=5, headers=headers) as client:
+        while not stop.is_set():
+            try:
+                response = await client.get("/metrics")
+                if response.status_code == 200:
+                    samples.append(response.json())
+            except (httpx.HTTPError, ValueError):
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _report(recorder: Recorder, samples: List[dict], elapsed: float):
+    print(f"\nCompleted {recorder.completed} quizzes in {elapsed:.1f}s "
+          f"({recorder.completed / elapsed:.2f} quizzes/s)\n")
+    print(f"{'step':<10}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for step in ("generate", "attempt", "submit"):
+        values = recorder.latencies.get(step)
+        if not values:
+            continue
+        print(f"{step:<10}{len(values):>8}{statistics.mean(values):>9.3f}{_percentile(values, 0.50):>9.3f}"
+              f"{_percentile(values, 0.95):>9.3f}{_percentile(values, 0.99):>9.3f}{max(values):>9.3f}")
+
+    pool = [s["db_pool"] for s in samples if "db_pool" in s]
+    if pool:
+        capacity = pool[-1]["capacity"]
+        peak = max(p["checked_out"] for p in pool)
+        saturated = sum(1 for p in pool if p["checked_out"] >= capacity)
+        print(f"\nDB pool: peak {peak}/{capacity} connections checked out, "
+              f"mean {statistics.mean(p['checked_out'] for p in pool):.1f}, "
+              f"saturated in {saturated}/{len(pool)} samples")
+    if samples:
+        counters = samples[-1].get("counters", {})
+        interesting = {k: v for k, v in counters.items() if k.startswith("llm_")}
+        if interesting:
+            print("LLM counters: " + ", ".join(f"{k}={v}" for k, v in sorted(interesting.items())))
+
+    if recorder.errors:
+        print("\nErrors:")
+        for reason, count in sorted(recorder.errors.items(), key=lambda item: -item[1]):
+            print(f"  {count:>6}  {reason}")
+
+
+async def run(args):
+    timeout = httpx.Timeout(args.request_timeout)
+    recorder = Recorder()
+    samples: List[dict] = []
+    stop = asyncio.Event()
+    sampler = None
+    if args.metrics_token:
+        sampler = asyncio.create_task(_sample_pool(args.base_url, args.metrics_token, samples, stop))
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(_virtual_user(args, recorder, deadline, timeout) for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+
+    stop.set()
+    if sampler is not None:
+        await sampler
+    _report(recorder, samples, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users running in parallel")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting new iterations")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--difficulty", default="medium", choices=["easy", "medium", "hard"])
+    parser.add_argument("--topic", default="Photosynthesis")
+    parser.add_argument("--allow-cache", action="store_true", help="don't send force_refresh")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--metrics-token", help="the app's METRICS_TOKEN, to sample DB pool saturation")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Local stand-in for the HuggingFace chat completions endpoint.
+
+Serves OpenAI-style /v1/chat/completions (plain and stream=true) with
+generated MCQ questions, a configurable latency distribution, error rate
+and share of malformed outputs. No network access or credits needed.
+
+    python -m benchmarks.mock_llm --port 9000 --latency-median 2 --error-rate 0.05
+
+Then start the app against it:
+
+    HF_API_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Mock LLM")
+
+config = {
+    "latency_median": 1.0,     # seconds, lognormal median of the full completion
+    "latency_sigma": 0.5,      # lognormal shape; larger = heavier tail
+    "error_rate": 0.0,         # share of requests answered with 429/500/503
+    "malformed_rate": 0.0,     # share of completions with broken JSON
+    "stream_chunk_chars": 24,  # characters per streamed delta
+}
+
+
+def _questions(count: int) -> list:
+    return [
+        {
+            "question": f"Mock question {uuid.uuid4().hex[:8]} number {i + 1}?",
+            "option_a": "First option",
+            "option_b": "Second option",
+            "option_c": "Third option",
+            "option_d": "Fourth option",
+            "correct_option": random.choice("ABCD"),
+            "explanation": "Generated by the mock LLM server.",
+        }
+        for i in range(count)
+    ]
+
+
+def _malform(text: str) -> str:
+    """Typical real-world breakage: prose + fences, trailing comma, or truncation."""
+    kind = random.choice(["fenced", "trailing_comma", "truncated"])
+    if kind == "fenced":
+        return f"Sure! Here are your questions:\n```json\n{text}\n```\nLet me know if you need more."
+    if kind == "trailing_comma":
+        return text[:-1].rstrip() + ",\n]"
+    return text[: int(len(text) * random.uniform(0.5, 0.95))]
+
+
+def _completion_text(messages: list) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    match = re.search(r"Generate exactly (\d+)", prompt)
+    count = int(match.group(1)) if match else 5
+    text = json.dumps(_questions(count), indent=2)
+    if random.random() < config["malformed_rate"]:
+        text = _malform(text)
+    return text
+
+
+def _error_response():
+    status = random.choice([429, 500, 503])
+    headers = {"Retry-After": "1"} if status == 429 else {}
+    return JSONResponse({"error": "mock upstream failure"}, status_code=status, headers=headers)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    latency = random.lognormvariate(0, config["latency_sigma"]) * config["latency_median"]
+
+    if random.random() < config["error_rate"]:
+        await asyncio.sleep(latency * random.random())
+        return _error_response()
+
+    text = _completion_text(body.get("messages", []))
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        return {
+            "id": f"mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }
+
+    size = config["stream_chunk_chars"]
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+    async def events():
+        for piece in pieces:
+            await asyncio.sleep(latency / len(pieces))
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-median", type=float, default=config["latency_median"])
+    parser.add_argument("--latency-sigma", type=float, default=config["latency_sigma"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--malformed-rate", type=float, default=config["malformed_rate"])
+    parser.add_argument("--stream-chunk-chars", type=int, default=config["stream_chunk_chars"])
+    args = parser.parse_args()
+
+    config.update(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        stream_chunk_chars=args.stream_chunk_chars,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
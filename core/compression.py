@@ -0,0 +1,34 @@
+import zlib
+from typing import Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+# Compression for large stored text. The codec is stored next to the data,
+# so rows written with zstd stay readable only where zstandard is installed,
+# while zlib rows are readable everywhere.
+
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+
+
+def compress(text: str) -> Tuple[str, bytes]:
+    """Returns (codec, data)."""
+    raw = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Text was stored with zstd; install the zstandard package to read it")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    return raw.decode("utf-8")
@@ -8,8 +8,85 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
 
+    # Database connection pool (per worker)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
+    # GET /metrics is disabled unless a token is set; scrapers send it as a Bearer token
+    METRICS_TOKEN: Optional[str] = None
+
     HF_API_TOKEN: str
     HF_MODEL_ID: str = "Qwen/Qwen2.5-72B-Instruct"
+    HF_API_URL: str = "https://router.huggingface.co/v1/chat/completions"
+
+    # Shared async LLM client (opened in main.lifespan)
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 60.0
+    LLM_WRITE_TIMEOUT: float = 10.0
+    LLM_POOL_TIMEOUT: float = 10.0
+    LLM_MAX_TOKENS: int = 3000  # completion budget of a full quiz; smaller requests get their share
+    LLM_TEMPERATURE: float = 0.3
+
+    # Upstream resilience: retries, circuit breaker, hedged requests
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+
+    # LLM call scheduling: global cap, priority lanes, fair share and token budgets per user
+    LLM_CONCURRENCY: int = 16  # upstream calls in flight per worker
+    LLM_BACKGROUND_CONCURRENCY: int = 4  # of which background prefetch may use at most
+    LLM_USER_TOKENS_PER_MINUTE: int = 60000  # prompt + max_tokens, refill rate per user
+    LLM_USER_TOKEN_BURST: int = 30000
+    LLM_BUDGET_MAX_WAIT_SECONDS: float = 10.0  # requests needing a longer wait are rejected
+
+    # Generation cache (in-process LRU backed by the generation_cache table)
+    GEN_CACHE_ENABLED: bool = True
+    GEN_CACHE_MAX_ENTRIES: int = 512
+    GEN_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Map-reduce generation over long documents
+    GEN_CHUNK_TOKENS: int = 2000
+    GEN_CHUNK_CONCURRENCY: int = 4
+
+    # Prompt context selection
+    GEN_CONTEXT_TOKENS: int = 1500  # token budget for the content of one prompt
+    PASSAGE_INDEX_CACHE_SIZE: int = 64
+    TOKENIZER_ID: Optional[str] = None  # HF repo with tokenizer.json; defaults to HF_MODEL_ID
+
+    # Coalescing of identical in-flight LLM requests
+    SINGLEFLIGHT_DISTRIBUTED: bool = False  # also coalesce across workers via pg advisory locks
+    SINGLEFLIGHT_WAIT_SECONDS: float = 90.0
+    SINGLEFLIGHT_POLL_SECONDS: float = 0.5
+    SINGLEFLIGHT_LOCK_CONNECTIONS: int = 8  # per worker, separate from the request pool
+
+    # Background generation jobs
+    JOB_WORKERS: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_STALE_SECONDS: int = 600
+    JOB_REQUEUE_INTERVAL_SECONDS: float = 60.0  # how often stale running jobs are looked for
+
+    # Pre-generated question pools per StudySource and difficulty
+    POOL_ENABLED: bool = True
+    POOL_LOW_WATERMARK: int = 10
+    POOL_HIGH_WATERMARK: int = 30
+
+    # Text extraction worker processes (created in main.lifespan)
+    EXTRACT_WORKERS: int = 0  # 0 = one per CPU core
+    EXTRACT_TIMEOUT_SECONDS: int = 60
+    EXTRACT_MEMORY_LIMIT_MB: int = 2048  # address-space limit per worker, 0 = unlimited
+    SOURCE_TEXT_MAX_CHARS: int = 50000  # extracted text kept per source; PDF extraction stops early past it
+    EXTRACT_LANGCHAIN_FALLBACK: bool = True  # retry with LangChain loaders (imported lazily) when a native backend fails
+    OCR_PREPROCESS: bool = True  # downscale, grayscale, deskew, binarize and crop images before Tesseract
+    OCR_CACHE_ENABLED: bool = True  # OCR text cached on disk under UPLOAD_DIR/ocr_cache by image SHA-256
 
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE_MB: int = 10
@@ -0,0 +1,38 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+# Process-local counters and gauges, exposed as JSON on GET /metrics.
+# Each uvicorn worker reports its own values.
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+
+
+def inc(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters.get(name, _gauges.get(name, 0))
+
+
+def ratio(numerator: str, denominator: str) -> float:
+    """Share of `numerator` in `numerator + denominator`, 0 when both are unset."""
+    with _lock:
+        num = _counters.get(numerator, 0)
+        total = num + _counters.get(denominator, 0)
+    return round(num / total, 4) if total else 0.0
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
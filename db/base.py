@@ -20,20 +20,21 @@ def _get_db_url() -> str:
 engine = create_engine(
     _get_db_url(),
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+)
+
+# Connections that hold a cross-worker singleflight lock for the length of an
+# LLM call (services/singleflight). A pool of their own, so slow upstream
+# calls never tie up connections that requests need.
+lock_engine = create_engine(
+    _get_db_url(),
+    pool_pre_ping=True,
+    pool_size=settings.SINGLEFLIGHT_LOCK_CONNECTIONS,
+    max_overflow=0,
+    pool_timeout=1,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
-
-
-def create_tables():
-    """Create all tables. Called at app startup."""
-    import models.user  # noqa
-    import models.study_source  # noqa
-    import models.quiz_session  # noqa
-    import models.quiz_question  # noqa
-    import models.user_answer  # noqa
-    Base.metadata.create_all(bind=engine)
@@ -0,0 +1,20 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+
+# Schema changes are Alembic migrations (migrations/versions). main.lifespan
+# applies them at startup; `python -m db.migrate` does the same by hand.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def upgrade(revision: str = "head"):
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.attributes["configure_logging"] = False  # keep uvicorn's logging setup
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,50 @@
+import threading
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db.base import engine as default_engine
+
+# Counts the SQL statements an engine executes, for checking that a page
+# stays within its query budget (see benchmarks/check_query_counts.py):
+#
+#     with assert_max_queries(3):
+#         client.get(f"/quiz/{session_id}/review")
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(bind: Engine = default_engine):
+    """Yield a QueryCounter that sees every statement run on `bind` (from
+    any thread, so requests served by a test client's threadpool count)."""
+    counter = QueryCounter()
+    event.listen(bind, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", counter._record)
+
+
+@contextmanager
+def assert_max_queries(limit: int, bind: Engine = default_engine):
+    """Fail with the offending statements if the block runs more than `limit`."""
+    with count_queries(bind) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {' '.join(s.split())}" for i, s in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{listing}")
@@ -1,6 +1,6 @@
 -- QuizGen Database Schema
 -- Run this against your PostgreSQL database to set up all tables
--- Or use the built-in create_tables() at app startup (auto-runs via SQLAlchemy)
+-- The app manages the schema with Alembic (migrations/, run at startup); this file is a reference
 
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";  -- for gen_random_uuid()
 
@@ -73,9 +73,88 @@ CREATE TABLE IF NOT EXISTS user_answers (
     CONSTRAINT ck_selected_option CHECK (selected_option IN ('A','B','C','D') OR selected_option IS NULL)
 );
 
+-- 6. Generation Cache (raw LLM responses keyed by request hash)
+CREATE TABLE IF NOT EXISTS generation_cache (
+    key VARCHAR(64) PRIMARY KEY,
+    model_id VARCHAR(255) NOT NULL,
+    response TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- 7. Generation Jobs (background quiz generation queue)
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    payload JSONB NOT NULL,
+    session_id UUID REFERENCES quiz_sessions(id) ON DELETE SET NULL,
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- 8. Pooled Questions (pre-generated per source and difficulty)
+CREATE TABLE IF NOT EXISTS pooled_questions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    source_id UUID NOT NULL REFERENCES study_sources(id) ON DELETE CASCADE,
+    difficulty VARCHAR(20) NOT NULL,
+    question_text TEXT NOT NULL,
+    option_a TEXT NOT NULL,
+    option_b TEXT NOT NULL,
+    option_c TEXT NOT NULL,
+    option_d TEXT NOT NULL,
+    correct_option CHAR(1) NOT NULL,
+    explanation TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- 9. Source Blobs (uploaded files, shared by content hash)
+CREATE TABLE IF NOT EXISTS source_blobs (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    source_type VARCHAR(50) NOT NULL,
+    file_path TEXT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 1,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE study_sources ADD COLUMN IF NOT EXISTS blob_sha256 VARCHAR(64) REFERENCES source_blobs(sha256);
+
+-- 10. Source Texts (compressed extracted text of a blob, read only for generation)
+CREATE TABLE IF NOT EXISTS source_texts (
+    blob_sha256 VARCHAR(64) PRIMARY KEY REFERENCES source_blobs(sha256) ON DELETE CASCADE,
+    codec VARCHAR(10) NOT NULL,
+    data BYTEA NOT NULL,
+    chars INT NOT NULL
+);
+
+-- 11. User Stats (running totals per user, updated with every quiz created or submitted)
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_quizzes INT NOT NULL DEFAULT 0,
+    completed_quizzes INT NOT NULL DEFAULT 0,
+    percentage_sum NUMERIC(12,2) NOT NULL DEFAULT 0,
+    best_percentage NUMERIC(5,2),
+    current_streak INT NOT NULL DEFAULT 0,
+    best_streak INT NOT NULL DEFAULT 0,
+    last_completed_on DATE,
+    by_difficulty JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_study_sources_user_id ON study_sources(user_id);
-CREATE INDEX IF NOT EXISTS idx_quiz_sessions_user_id ON quiz_sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_quiz_questions_session_id ON quiz_questions(session_id);
-CREATE INDEX IF NOT EXISTS idx_user_answers_session_id ON user_answers(session_id);
+CREATE INDEX IF NOT EXISTS idx_study_sources_user_created ON study_sources(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_user_created ON quiz_sessions(user_id, created_at DESC, id)
+    INCLUDE (status, percentage);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_source_id ON quiz_sessions(source_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_questions_session_order ON quiz_questions(session_id, order_index);
+CREATE INDEX IF NOT EXISTS idx_user_answers_session_question ON user_answers(session_id, question_id)
+    INCLUDE (selected_option, is_correct);
 CREATE INDEX IF NOT EXISTS idx_user_answers_question_id ON user_answers(question_id);
+CREATE INDEX IF NOT EXISTS idx_generation_cache_expires_at ON generation_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status_created_at ON generation_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_pooled_questions_source_difficulty ON pooled_questions(source_id, difficulty, created_at);
+CREATE INDEX IF NOT EXISTS ix_study_sources_blob_sha256 ON study_sources(blob_sha256);
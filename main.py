@@ -1,22 +1,38 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
+import asyncio
 import os
+import secrets
 
-from db.base import create_tables
+from db import migrate
+from db.base import engine
 from routers import auth, sources, quiz, profile
+from services import ai_service, extraction, job_service, pool_service, tokenizer
+from services.cache_service import generation_cache
 from core.config import settings
+from core import metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    create_tables()
+    migrate.upgrade()
+    generation_cache.purge_expired()
+    await asyncio.to_thread(tokenizer.load)
+    extraction.start()
+    await ai_service.open_client()
+    await job_service.start_workers()
+    pool_service.start()
     yield
-    # Shutdown (cleanup if needed)
+    # Shutdown
+    await pool_service.stop()
+    await job_service.stop_workers()
+    await ai_service.close_client()
+    extraction.stop()
 
 
 app = FastAPI(
@@ -32,6 +48,24 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates
 templates = Jinja2Templates(directory="templates")
 
+# Oversized uploads are refused from Content-Length, before the multipart
+# body is read; source_service enforces the limit again while copying.
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    if request.method == "POST" and request.url.path == "/sources/upload":
+        length = request.headers.get("content-length", "")
+        max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + UPLOAD_OVERHEAD_BYTES
+        if length.isdigit() and int(length) > max_bytes:
+            return HTMLResponse(
+                f"File too large. Max size: {settings.MAX_UPLOAD_SIZE_MB}MB", status_code=413,
+                headers={"Connection": "close"},
+            )
+    return await call_next(request)
+
+
 # Routers
 app.include_router(auth.router)
 app.include_router(sources.router)
@@ -47,6 +81,28 @@ def root(request: Request):
     return templates.TemplateResponse("auth/login.html", {"request": request})
 
 
+@app.get("/metrics", response_class=JSONResponse)
+def metrics_endpoint(request: Request):
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "")
+    if not secrets.compare_digest(supplied.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+    data = metrics.snapshot()
+    data["generation_cache"] = generation_cache.stats()
+    data["pool_served_ratio"] = metrics.ratio("quizzes_served_pool", "quizzes_served_live")
+    extracted = metrics.get("text_chars_extracted")
+    data["text_normalized_ratio"] = round(metrics.get("text_chars_normalized") / extracted, 4) if extracted else 1.0
+    data["db_pool"] = {
+        "checked_out": engine.pool.checkedout(),
+        "idle": engine.pool.checkedin(),
+        "overflow": engine.pool.overflow(),
+        "capacity": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    }
+    return data
+
+
 @app.get("/dashboard", response_class=HTMLResponse)
 def dashboard(request: Request):
     from core.dependencies import get_current_user
@@ -56,6 +112,7 @@ def dashboard(request: Request):
         from core.security import decode_access_token
         from models.user import User
         from models.quiz_session import QuizSession
+        from services import stats_service
 
         token = request.cookies.get("access_token")
         if not token:
@@ -77,23 +134,13 @@ def dashboard(request: Request):
             .all()
         )
 
-        total_quizzes = db.query(QuizSession).filter(QuizSession.user_id == user.id).count()
-        completed = db.query(QuizSession).filter(
-            QuizSession.user_id == user.id,
-            QuizSession.status.in_(["completed", "timed_out"])
-        ).all()
-        avg_score = (
-            round(sum(s.percentage for s in completed if s.percentage) / len(completed), 1)
-            if completed else 0
-        )
+        stats = stats_service.get_stats(db, user.id)
 
         return templates.TemplateResponse("dashboard/index.html", {
             "request": request,
             "user": user,
             "recent_sessions": recent_sessions,
-            "total_quizzes": total_quizzes,
-            "avg_score": avg_score,
-            "completed_count": len(completed),
+            "stats": stats,
         })
     finally:
         db.close()
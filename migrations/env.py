@@ -0,0 +1,55 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+
+from db.base import Base, _get_db_url
+import models.user  # noqa
+import models.study_source  # noqa
+import models.quiz_session  # noqa
+import models.quiz_question  # noqa
+import models.user_answer  # noqa
+import models.generation_cache  # noqa
+import models.generation_job  # noqa
+import models.pooled_question  # noqa
+import models.source_blob  # noqa
+import models.source_text  # noqa
+import models.user_stats  # noqa
+
+# Every uvicorn worker runs migrations at startup; a session-level advisory
+# lock makes them take turns, so only the first one does any work.
+MIGRATION_LOCK_KEY = 0x5155495A  # "QUIZ"
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(url=_get_db_url(), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_engine(_get_db_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+        try:
+            context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
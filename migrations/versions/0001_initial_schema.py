@@ -0,0 +1,193 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Databases created by the old create_tables() at startup already hold the
+original tables (users, study_sources, quiz_sessions, quiz_questions,
+user_answers), so each table and index is created only if missing, and the
+original tables get the columns and defaults added since (idempotently). A
+fresh database gets the full schema.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Brings the original tables, as create_tables() made them, up to this schema
+LEGACY_ALTERS = [
+    "ALTER TABLE study_sources ADD COLUMN IF NOT EXISTS blob_sha256 VARCHAR(64) REFERENCES source_blobs(sha256)",
+    "ALTER TABLE quiz_questions ALTER COLUMN id SET DEFAULT gen_random_uuid()",
+    "ALTER TABLE user_answers ALTER COLUMN id SET DEFAULT gen_random_uuid()",
+]
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    def create_table(name, *columns):
+        if name not in existing:
+            op.create_table(name, *columns)
+
+    if op.get_bind().dialect.server_version_info < (13,):
+        op.execute('CREATE EXTENSION IF NOT EXISTS "pgcrypto"')  # gen_random_uuid() is built in from 13
+
+    create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("username", sa.String(100), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True, if_not_exists=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True, if_not_exists=True)
+
+    create_table(
+        "source_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("source_type", sa.String(50), nullable=False),
+        sa.Column("file_path", sa.Text(), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    create_table(
+        "source_texts",
+        sa.Column("blob_sha256", sa.String(64), sa.ForeignKey("source_blobs.sha256", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("codec", sa.String(10), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("chars", sa.Integer(), nullable=False),
+    )
+
+    create_table(
+        "study_sources",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("source_type", sa.String(50), nullable=False),
+        sa.Column("file_name", sa.String(255)),
+        sa.Column("file_path", sa.Text()),
+        sa.Column("raw_text", sa.Text()),
+        sa.Column("blob_sha256", sa.String(64), sa.ForeignKey("source_blobs.sha256")),
+        sa.Column("topic", sa.String(255)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    create_table(
+        "quiz_sessions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("source_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("study_sources.id", ondelete="SET NULL")),
+        sa.Column("title", sa.String(255)),
+        sa.Column("num_questions", sa.Integer(), nullable=False),
+        sa.Column("difficulty", sa.String(20)),
+        sa.Column("time_limit_seconds", sa.Integer(), nullable=False),
+        sa.Column("time_taken_seconds", sa.Integer()),
+        sa.Column("score", sa.Integer()),
+        sa.Column("total_questions", sa.Integer(), nullable=False),
+        sa.Column("percentage", sa.Numeric(5, 2)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    create_table(
+        "quiz_questions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("session_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("quiz_sessions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("question_text", sa.Text(), nullable=False),
+        sa.Column("option_a", sa.Text(), nullable=False),
+        sa.Column("option_b", sa.Text(), nullable=False),
+        sa.Column("option_c", sa.Text(), nullable=False),
+        sa.Column("option_d", sa.Text(), nullable=False),
+        sa.Column("correct_option", sa.String(1), nullable=False),
+        sa.Column("explanation", sa.Text()),
+        sa.Column("order_index", sa.Integer(), nullable=False),
+        sa.CheckConstraint("correct_option IN ('A','B','C','D')", name="ck_correct_option"),
+    )
+
+    create_table(
+        "user_answers",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("session_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("quiz_sessions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("question_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("quiz_questions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("selected_option", sa.String(1)),
+        sa.Column("is_correct", sa.Boolean()),
+        sa.Column("answered_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.CheckConstraint("selected_option IN ('A','B','C','D') OR selected_option IS NULL",
+                           name="ck_selected_option"),
+    )
+
+    create_table(
+        "generation_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("model_id", sa.String(255), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_generation_cache_expires_at", "generation_cache", ["expires_at"], if_not_exists=True)
+
+    create_table(
+        "generation_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("session_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("quiz_sessions.id", ondelete="SET NULL")),
+        sa.Column("error", sa.Text()),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("idx_generation_jobs_status_created_at", "generation_jobs", ["status", "created_at"],
+                    if_not_exists=True)
+
+    create_table(
+        "pooled_questions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("source_id", postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey("study_sources.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("difficulty", sa.String(20), nullable=False),
+        sa.Column("question_text", sa.Text(), nullable=False),
+        sa.Column("option_a", sa.Text(), nullable=False),
+        sa.Column("option_b", sa.Text(), nullable=False),
+        sa.Column("option_c", sa.Text(), nullable=False),
+        sa.Column("option_d", sa.Text(), nullable=False),
+        sa.Column("correct_option", sa.String(1), nullable=False),
+        sa.Column("explanation", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("idx_pooled_questions_source_difficulty", "pooled_questions",
+                    ["source_id", "difficulty", "created_at"], if_not_exists=True)
+
+    for statement in LEGACY_ALTERS:
+        op.execute(statement)
+    op.create_index("ix_study_sources_blob_sha256", "study_sources", ["blob_sha256"], if_not_exists=True)
+
+
+def downgrade():
+    for name in (
+        "pooled_questions", "generation_jobs", "generation_cache", "user_answers", "quiz_questions",
+        "quiz_sessions", "study_sources", "source_texts", "source_blobs", "users",
+    ):
+        op.drop_table(name)
@@ -0,0 +1,76 @@
+"""Composite and covering indexes for the hot query shapes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+- quiz_sessions by user, newest first (dashboard, history, keyset pages),
+  covering status and percentage so counts and score averages are
+  index-only
+- study_sources by user, newest first (sources page, generate picker)
+- quiz_questions by session in question order (attempt, submit, review)
+- user_answers by session and question, covering the answer itself (review)
+- quiz_sessions.source_id, so deleting a source doesn't scan every session
+
+The single-column user_id/session_id indexes from db/schema.sql are
+prefixes of these and are dropped. Indexes are built CONCURRENTLY so a
+large table stays writable while this runs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SUPERSEDED = [
+    ("idx_study_sources_user_id", "study_sources", ["user_id"]),
+    ("idx_quiz_sessions_user_id", "quiz_sessions", ["user_id"]),
+    ("idx_quiz_questions_session_id", "quiz_questions", ["session_id"]),
+    ("idx_user_answers_session_id", "user_answers", ["session_id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_quiz_sessions_user_created", "quiz_sessions", ["user_id", sa.text("created_at DESC"), "id"],
+            postgresql_include=["status", "percentage"], postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "idx_study_sources_user_created", "study_sources", ["user_id", sa.text("created_at DESC")],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "idx_quiz_questions_session_order", "quiz_questions", ["session_id", "order_index"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "idx_user_answers_session_question", "user_answers", ["session_id", "question_id"],
+            postgresql_include=["selected_option", "is_correct"], postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "idx_user_answers_question_id", "user_answers", ["question_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "idx_quiz_sessions_source_id", "quiz_sessions", ["source_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        for name, table, _ in SUPERSEDED:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in SUPERSEDED:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table in (
+            ("idx_quiz_sessions_source_id", "quiz_sessions"),
+            ("idx_user_answers_session_question", "user_answers"),
+            ("idx_quiz_questions_session_order", "quiz_questions"),
+            ("idx_study_sources_user_created", "study_sources"),
+            ("idx_quiz_sessions_user_created", "quiz_sessions"),
+        ):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
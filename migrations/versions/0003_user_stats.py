@@ -0,0 +1,93 @@
+"""Per-user quiz statistics
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Creates user_stats and fills it from quiz_sessions. The backfill is a copy
+of services.stats_service.REBUILD_SQL as of this revision (for all users),
+kept here so later changes to the service don't change this migration.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BACKFILL_SQL = """
+WITH totals AS (
+    SELECT user_id, count(*) AS total_quizzes
+    FROM quiz_sessions
+    GROUP BY user_id
+),
+finished AS (
+    SELECT user_id, COALESCE(difficulty, 'medium') AS difficulty, COALESCE(percentage, 0) AS percentage,
+           (completed_at AT TIME ZONE 'UTC')::date AS day
+    FROM quiz_sessions
+    WHERE status IN ('completed', 'timed_out') AND completed_at IS NOT NULL
+),
+results AS (
+    SELECT user_id, count(*) AS completed_quizzes, sum(percentage) AS percentage_sum,
+           max(percentage) AS best_percentage, max(day) AS last_completed_on
+    FROM finished
+    GROUP BY user_id
+),
+difficulties AS (
+    SELECT user_id, jsonb_object_agg(difficulty, jsonb_build_object('completed', n, 'percentage_sum', s))
+           AS by_difficulty
+    FROM (
+        SELECT user_id, difficulty, count(*) AS n, sum(percentage)::float8 AS s
+        FROM finished
+        GROUP BY user_id, difficulty
+    ) d
+    GROUP BY user_id
+),
+runs AS (
+    SELECT user_id, count(*) AS length, max(day) AS last_day
+    FROM (
+        SELECT user_id, day, day - (row_number() OVER (PARTITION BY user_id ORDER BY day))::int AS run
+        FROM (SELECT DISTINCT user_id, day FROM finished) days
+    ) r
+    GROUP BY user_id, run
+),
+streaks AS (
+    SELECT user_id, max(length) AS best_streak, (array_agg(length ORDER BY last_day DESC))[1] AS current_streak
+    FROM runs
+    GROUP BY user_id
+)
+INSERT INTO user_stats (user_id, total_quizzes, completed_quizzes, percentage_sum, best_percentage,
+                        current_streak, best_streak, last_completed_on, by_difficulty, updated_at)
+SELECT u.id, COALESCE(t.total_quizzes, 0), COALESCE(r.completed_quizzes, 0), COALESCE(r.percentage_sum, 0),
+       r.best_percentage, COALESCE(s.current_streak, 0), COALESCE(s.best_streak, 0), r.last_completed_on,
+       COALESCE(d.by_difficulty, '{}'::jsonb), now()
+FROM users u
+LEFT JOIN totals t ON t.user_id = u.id
+LEFT JOIN results r ON r.user_id = u.id
+LEFT JOIN difficulties d ON d.user_id = u.id
+LEFT JOIN streaks s ON s.user_id = u.id
+"""
+
+
+def upgrade():
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("total_quizzes", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("completed_quizzes", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("percentage_sum", sa.Numeric(12, 2), nullable=False, server_default=sa.text("0")),
+        sa.Column("best_percentage", sa.Numeric(5, 2)),
+        sa.Column("current_streak", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("best_streak", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("last_completed_on", sa.Date()),
+        sa.Column("by_difficulty", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    op.drop_table("user_stats")
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of prompt + model + sampling params
+    model_id = Column(String(255), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,26 @@
+import uuid
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class PooledQuestion(Base):
+    """A validated question generated ahead of time, waiting to be drawn into a quiz."""
+    __tablename__ = "pooled_questions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_id = Column(UUID(as_uuid=True), ForeignKey("study_sources.id", ondelete="CASCADE"), nullable=False)
+    difficulty = Column(String(20), nullable=False)
+    question_text = Column(Text, nullable=False)
+    option_a = Column(Text, nullable=False)
+    option_b = Column(Text, nullable=False)
+    option_c = Column(Text, nullable=False)
+    option_d = Column(Text, nullable=False)
+    correct_option = Column(String(1), nullable=False)
+    explanation = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_pooled_questions_source_difficulty", "source_id", "difficulty", "created_at"),
+    )
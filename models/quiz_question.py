@@ -1,5 +1,4 @@
-import uuid
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, CheckConstraint
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, CheckConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from db.base import Base
@@ -8,7 +7,7 @@ from db.base import Base
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     session_id = Column(UUID(as_uuid=True), ForeignKey("quiz_sessions.id", ondelete="CASCADE"), nullable=False)
     question_text = Column(Text, nullable=False)
     option_a = Column(Text, nullable=False)
@@ -21,6 +20,7 @@ class QuizQuestion(Base):
 
     __table_args__ = (
         CheckConstraint("correct_option IN ('A','B','C','D')", name="ck_correct_option"),
+        Index("idx_quiz_questions_session_order", "session_id", "order_index"),
     )
 
     # Relationships
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Numeric
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -20,7 +20,7 @@ class QuizSession(Base):
     score = Column(Integer, default=0)
     total_questions = Column(Integer, nullable=False)
     percentage = Column(Numeric(5, 2), nullable=True)
-    status = Column(String(20), default="pending")  # pending, in_progress, completed, timed_out
+    status = Column(String(20), default="pending")  # generating, pending, in_progress, completed, timed_out
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -31,3 +31,13 @@ class QuizSession(Base):
     questions = relationship("QuizQuestion", back_populates="session", cascade="all, delete-orphan",
                              order_by="QuizQuestion.order_index")
     user_answers = relationship("UserAnswer", back_populates="session", cascade="all, delete-orphan")
+
+
+# Dashboard and history: a user's sessions newest first, with counts and
+# score averages answered from the index alone
+Index(
+    "idx_quiz_sessions_user_created",
+    QuizSession.user_id, QuizSession.created_at.desc(), QuizSession.id,
+    postgresql_include=["status", "percentage"],
+)
+Index("idx_quiz_sessions_source_id", QuizSession.source_id)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Text, DateTime, Integer, BigInteger
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class SourceBlob(Base):
+    """One uploaded file, shared by every StudySource with the same content.
+    Its extracted text lives in SourceText."""
+    __tablename__ = "source_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    source_type = Column(String(50), nullable=False)  # pdf, docx, image
+    file_path = Column(Text, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    content = relationship("SourceText", uselist=False, passive_deletes=True)
+
+    @property
+    def text(self):
+        return self.content.text
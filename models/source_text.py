@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, ForeignKey
+from db.base import Base
+from core import compression
+
+
+class SourceText(Base):
+    """Compressed extracted text of a SourceBlob. Kept in its own table so
+    that listing sources or blobs never reads it; loaded only to generate."""
+    __tablename__ = "source_texts"
+
+    blob_sha256 = Column(String(64), ForeignKey("source_blobs.sha256", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String(10), nullable=False)  # zstd, zlib
+    data = Column(LargeBinary, nullable=False)
+    chars = Column(Integer, nullable=False)
+
+    @property
+    def text(self) -> str:
+        return compression.decompress(self.codec, self.data)
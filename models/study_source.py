@@ -1,7 +1,7 @@
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from db.base import Base
 
@@ -14,10 +14,21 @@ class StudySource(Base):
     source_type = Column(String(50), nullable=False)  # pdf, docx, topic, image
     file_name = Column(String(255), nullable=True)
     file_path = Column(Text, nullable=True)
-    raw_text = Column(Text, nullable=True)
+    raw_text = deferred(Column(Text, nullable=True))  # only on sources created before blobs existed
+    blob_sha256 = Column(String(64), ForeignKey("source_blobs.sha256"), nullable=True, index=True)
     topic = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="study_sources")
     quiz_sessions = relationship("QuizSession", back_populates="source")
+    blob = relationship("SourceBlob")
+
+    @property
+    def extracted_text(self):
+        """Text of a file source: from its shared blob, or inline on older rows.
+        Loads the text on first access; listing queries never touch it."""
+        return self.blob.text if self.blob_sha256 else self.raw_text
+
+
+Index("idx_study_sources_user_created", StudySource.user_id, StudySource.created_at.desc())
@@ -1,5 +1,4 @@
-import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, CheckConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -9,7 +8,7 @@ from db.base import Base
 class UserAnswer(Base):
     __tablename__ = "user_answers"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     session_id = Column(UUID(as_uuid=True), ForeignKey("quiz_sessions.id", ondelete="CASCADE"), nullable=False)
     question_id = Column(UUID(as_uuid=True), ForeignKey("quiz_questions.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -20,6 +19,10 @@ class UserAnswer(Base):
     __table_args__ = (
         CheckConstraint("selected_option IN ('A','B','C','D') OR selected_option IS NULL",
                         name="ck_selected_option"),
+        # Review page: answers of a session, read from the index alone
+        Index("idx_user_answers_session_question", "session_id", "question_id",
+              postgresql_include=["selected_option", "is_correct"]),
+        Index("idx_user_answers_question_id", "question_id"),
     )
 
     # Relationships
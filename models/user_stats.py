@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Column, Integer, Numeric, Date, DateTime, ForeignKey, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class UserStats(Base):
+    """Running totals of a user's quizzes, kept up to date by stats_service
+    in the same transaction as the change they count, so the dashboard and
+    profile read one row instead of aggregating quiz_sessions."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_quizzes = Column(Integer, nullable=False, server_default=text("0"))
+    completed_quizzes = Column(Integer, nullable=False, server_default=text("0"))  # completed or timed out
+    percentage_sum = Column(Numeric(12, 2), nullable=False, server_default=text("0"))
+    best_percentage = Column(Numeric(5, 2), nullable=True)
+    current_streak = Column(Integer, nullable=False, server_default=text("0"))  # consecutive days (UTC)
+    best_streak = Column(Integer, nullable=False, server_default=text("0"))
+    last_completed_on = Column(Date, nullable=True)
+    # {"easy": {"completed": 3, "percentage_sum": 210.5}, ...}
+    by_difficulty = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @property
+    def avg_score(self) -> float:
+        if not self.completed_quizzes:
+            return 0
+        return round(float(self.percentage_sum) / self.completed_quizzes, 1)
+
+    @property
+    def active_streak(self) -> int:
+        """The current streak, or 0 once a whole day has passed without a quiz."""
+        today = datetime.now(timezone.utc).date()
+        if self.last_completed_on is None or self.last_completed_on < today - timedelta(days=1):
+            return 0
+        return self.current_streak
+
+    def difficulty_avg(self, difficulty: str) -> float:
+        entry = (self.by_difficulty or {}).get(difficulty)
+        if not entry or not entry["completed"]:
+            return 0
+        return round(entry["percentage_sum"] / entry["completed"], 1)
+
+
+def empty_stats(user_id) -> UserStats:
+    """Transient stats for a user with no row yet (server defaults only
+    apply on insert)."""
+    return UserStats(
+        user_id=user_id, total_quizzes=0, completed_quizzes=0, percentage_sum=0, best_percentage=None,
+        current_streak=0, best_streak=0, last_completed_on=None, by_difficulty={},
+    )
@@ -1,38 +1,45 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from core.dependencies import get_db, get_current_user
 from models.user import User
-from services import quiz_service
+from schemas.quiz import DIFFICULTIES
+from services import quiz_service, stats_service
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 templates = Jinja2Templates(directory="templates")
 
+PER_PAGE = 10
+
 
 @router.get("/", response_class=HTMLResponse)
 def profile_page(
     request: Request,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
     page: int = 1,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    sessions, total = quiz_service.get_user_history(db, user, page=page, per_page=10)
-    total_pages = (total + 9) // 10
-
-    # Compute stats
-    completed = [s for s in sessions if s.status in ["completed", "timed_out"]]
-    avg_score = (
-        round(sum(s.percentage for s in completed if s.percentage) / len(completed), 1)
-        if completed else 0
+    sessions, next_cursor, prev_cursor = quiz_service.get_user_history(
+        db, user, after=after, before=before, per_page=PER_PAGE,
     )
+    # The total is the maintained counter in user_stats, not a count(*);
+    # `page` only labels the page and travels along with the cursors
+    stats = stats_service.get_stats(db, user.id)
+    total_pages = max(1, (stats.total_quizzes + PER_PAGE - 1) // PER_PAGE)
+    page = 1 if not prev_cursor else min(max(page, 2), total_pages)
 
     return templates.TemplateResponse("profile/history.html", {
         "request": request,
         "user": user,
         "sessions": sessions,
-        "total": total,
         "page": page,
         "total_pages": total_pages,
-        "avg_score": avg_score,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "stats": stats,
+        "difficulties": DIFFICULTIES,
     })
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from contextlib import aclosing
 from typing import Optional
+from urllib.parse import urlencode
 import json
 
 from core.dependencies import get_db, get_current_user
+from db.base import SessionLocal
 from models.user import User
 from schemas.quiz import QuizGenerateRequest, QuizSubmitRequest
 from schemas.question import AnswerIn
-from services import quiz_service, source_service
+from services import quiz_service, source_service, job_service
 
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 templates = Jinja2Templates(directory="templates")
@@ -39,6 +42,57 @@ def generate_page(
     })
 
 
+@router.post("/jobs")
+def submit_generation_job(
+    source_id: Optional[str] = Form(None),
+    topic: Optional[str] = Form(None),
+    num_questions: int = Form(5),
+    time_limit_seconds: int = Form(300),
+    difficulty: str = Form("medium"),
+    force_refresh: bool = Form(False),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Queue a generation job and return immediately; poll the status URL for the result."""
+    try:
+        from uuid import UUID
+        data = QuizGenerateRequest(
+            source_id=UUID(source_id) if source_id else None,
+            topic=topic if topic else None,
+            num_questions=num_questions,
+            time_limit_seconds=time_limit_seconds,
+            difficulty=difficulty,
+            force_refresh=force_refresh,
+        )
+        job = job_service.submit_job(db, user, data)
+    except HTTPException as e:
+        return JSONResponse({"error": e.detail}, status_code=e.status_code)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=422)
+
+    return JSONResponse({
+        "job_id": str(job.id),
+        "status": job.status,
+        "status_url": f"/quiz/jobs/{job.id}",
+    }, status_code=202)
+
+
+@router.get("/jobs/{job_id}")
+def generation_job_status(
+    job_id: str,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    job = job_service.get_job(db, user, job_id)
+    body = {"job_id": str(job.id), "status": job.status}
+    if job.status == "done" and job.session_id:
+        body["session_id"] = str(job.session_id)
+        body["redirect"] = f"/quiz/{job.session_id}/attempt"
+    elif job.status == "failed":
+        body["error"] = job.error
+    return body
+
+
 @router.post("/generate")
 async def generate_quiz(
     request: Request,
@@ -47,6 +101,7 @@ async def generate_quiz(
     num_questions: int = Form(5),
     time_limit_seconds: int = Form(300),
     difficulty: str = Form("medium"),
+    force_refresh: bool = Form(False),
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -58,6 +113,7 @@ async def generate_quiz(
             num_questions=num_questions,
             time_limit_seconds=time_limit_seconds,
             difficulty=difficulty,
+            force_refresh=force_refresh,
         )
         session = await quiz_service.generate_quiz(db, user, data)
         return RedirectResponse(url=f"/quiz/{session.id}/attempt", status_code=302)
@@ -79,6 +135,80 @@ async def generate_quiz(
         }, status_code=500)
 
 
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.get("/live", response_class=HTMLResponse)
+def live_attempt_page(
+    request: Request,
+    num_questions: int = 5,
+    time_limit_seconds: int = 300,
+    difficulty: str = "medium",
+    user: User = Depends(get_current_user),
+):
+    """Attempt page that fills itself from the SSE stream while questions are generated."""
+    stream_url = "/quiz/generate/stream?" + urlencode(request.query_params)
+    return templates.TemplateResponse("quiz/attempt.html", {
+        "request": request,
+        "user": user,
+        "session": {
+            "title": "Generating your quiz…",
+            "difficulty": difficulty,
+            "total_questions": num_questions,
+        },
+        "questions_json": "[]",
+        "time_limit": time_limit_seconds,
+        "stream_url": stream_url,
+    })
+
+
+@router.get("/generate/stream")
+async def generate_quiz_stream(
+    request: Request,
+    source_id: Optional[str] = None,
+    topic: Optional[str] = None,
+    num_questions: int = 5,
+    time_limit_seconds: int = 300,
+    difficulty: str = "medium",
+    force_refresh: bool = False,
+    user: User = Depends(get_current_user),
+):
+    """Server-Sent Events: session, question (one per question), then done or failed."""
+
+    async def events():
+        # The request-scoped DB session is closed before the body is streamed,
+        # so the stream owns its own.
+        db = SessionLocal()
+        try:
+            from uuid import UUID
+            data = QuizGenerateRequest(
+                source_id=UUID(source_id) if source_id else None,
+                topic=topic if topic else None,
+                num_questions=num_questions,
+                time_limit_seconds=time_limit_seconds,
+                difficulty=difficulty,
+                force_refresh=force_refresh,
+            )
+            async with aclosing(quiz_service.stream_quiz(db, user, data)) as stream:
+                async for event, payload in stream:
+                    if await request.is_disconnected():
+                        break
+                    yield _sse(event, payload)
+        except HTTPException as e:
+            yield _sse("failed", {"detail": e.detail})
+        except Exception as e:
+            yield _sse("failed", {"detail": f"Something went wrong: {str(e)}"})
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{session_id}/attempt", response_class=HTMLResponse)
 def attempt_page(
     session_id: str,
@@ -90,10 +220,6 @@ def attempt_page(
     if session.status in ["completed", "timed_out"]:
         return RedirectResponse(url=f"/quiz/{session_id}/review", status_code=302)
 
-    # Start quiz if pending
-    if session.status == "pending":
-        session = quiz_service.start_quiz(db, user, session_id)
-
     questions = [
         {
             "id": str(q.id),
@@ -107,7 +233,7 @@ def attempt_page(
         for q in session.questions
     ]
 
-    return templates.TemplateResponse("quiz/attempt.html", {
+    response = templates.TemplateResponse("quiz/attempt.html", {
         "request": request,
         "user": user,
         "session": session,
@@ -116,6 +242,12 @@ def attempt_page(
         "time_limit": session.time_limit_seconds,
     })
 
+    # Start quiz if pending. Done after rendering: the commit expires every
+    # loaded object, and touching them again would reload them.
+    if session.status == "pending":
+        quiz_service.start_quiz(db, session)
+    return response
+
 
 @router.post("/{session_id}/submit")
 async def submit_quiz(
@@ -28,7 +28,7 @@ async def upload_file(
     db: Session = Depends(get_db),
 ):
     try:
-        source = await source_service.save_file_source(db, user, file)
+        source = await source_service.save_file_source(db, user, file, request.is_disconnected)
         return RedirectResponse(url=f"/quiz/generate?source_id={source.id}", status_code=302)
     except HTTPException as e:
         sources = source_service.get_user_sources(db, user)
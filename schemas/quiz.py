@@ -4,6 +4,8 @@ from uuid import UUID
 from typing import Optional, List
 from schemas.question import QuestionOut, QuestionReviewOut, AnswerIn
 
+DIFFICULTIES = ["easy", "medium", "hard"]
+
 
 class QuizGenerateRequest(BaseModel):
     source_id: Optional[UUID] = None
@@ -11,6 +13,7 @@ class QuizGenerateRequest(BaseModel):
     num_questions: int = 5
     time_limit_seconds: int = 300  # default 5 minutes
     difficulty: str = "medium"
+    force_refresh: bool = False  # bypass the generation cache
 
     @field_validator("num_questions")
     @classmethod
@@ -29,7 +32,7 @@ class QuizGenerateRequest(BaseModel):
     @field_validator("difficulty")
     @classmethod
     def validate_difficulty(cls, v):
-        if v not in ["easy", "medium", "hard"]:
+        if v not in DIFFICULTIES:
             raise ValueError("Difficulty must be easy, medium, or hard")
         return v
 
@@ -1,7 +1,62 @@
+import asyncio
 import json
 import re
-from typing import List, Dict
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Optional
+import httpx
 from core.config import settings
+from services.cache_service import generation_cache, make_key
+from core import metrics
+from services.question_parser import ParseReport, QuestionStreamParser, parse_questions
+from services.chunking import allocate_questions, group_consecutive
+from services import passage_selector
+from services.singleflight import distributed, llm_flight
+from services import llm_scheduler, llm_transport
+from services.tokenizer import count_tokens
+
+
+MAX_QUESTIONS = 10  # per quiz (QuizGenerateRequest) and per pool refill batch
+
+# App-scoped client, opened and closed by main.lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_client() -> httpx.AsyncClient:
+    """Create the shared pooled client used for every chat completion call."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=settings.LLM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.LLM_CONNECT_TIMEOUT,
+                read=settings.LLM_READ_TIMEOUT,
+                write=settings.LLM_WRITE_TIMEOUT,
+                pool=settings.LLM_POOL_TIMEOUT,
+            ),
+            headers={
+                "Authorization": f"Bearer {settings.HF_API_TOKEN}",
+                "Content-Type": "application/json",
+            },
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("LLM client is not open — call ai_service.open_client() at startup")
+    return _client
 
 
 def _build_messages(context: str, num_questions: int, difficulty: str) -> list:
@@ -16,7 +71,7 @@ def _build_messages(context: str, num_questions: int, difficulty: str) -> list:
 Difficulty level: {difficulty} — {difficulty_guidance.get(difficulty, '')}
 
 Content:
-{context[:8000]}
+{context}
 
 Return ONLY a valid JSON array, nothing else:
 [
@@ -75,71 +130,332 @@ Rules:
 
 
 def _parse_questions(raw_response: str, num_questions: int) -> List[Dict]:
-    text = raw_response.strip()
-    text = re.sub(r"```json\s*", "", text)
-    text = re.sub(r"```\s*", "", text)
-    text = text.strip()
-
-    start = text.find("[")
-    end = text.rfind("]") + 1
-    if start == -1 or end == 0:
+    report = parse_questions(raw_response, num_questions)
+    if not report.found:
         raise ValueError("No JSON array found in model response")
+    return report.questions
 
-    json_str = text[start:end]
-    questions = json.loads(json_str)
-
-    if not isinstance(questions, list):
-        raise ValueError("Expected a JSON array")
-
-    validated = []
-    for q in questions[:num_questions]:
-        if not all(k in q for k in ["question", "option_a", "option_b", "option_c", "option_d", "correct_option"]):
-            continue
-        correct = str(q["correct_option"]).strip().upper()
-        if correct not in ["A", "B", "C", "D"]:
-            correct = "A"
-        validated.append({
-            "question": str(q["question"]),
-            "option_a": str(q["option_a"]),
-            "option_b": str(q["option_b"]),
-            "option_c": str(q["option_c"]),
-            "option_d": str(q["option_d"]),
-            "correct_option": correct,
-            "explanation": str(q.get("explanation", "")),
-        })
-
-    return validated
-
-
-def _call_chat_api(messages: list) -> str:
-    """Call HuggingFace chat completions API via new router endpoint."""
-    import httpx
-
-    response = httpx.post(
-        f"https://router.huggingface.co/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {settings.HF_API_TOKEN}",
-            "Content-Type": "application/json",
-        },
+
+def _record_parse(report: ParseReport):
+    """Count salvaged and dropped questions of a fresh (paid-for) response."""
+    metrics.inc("questions_parsed", len(report.questions))
+    if report.repaired:
+        metrics.inc("questions_repaired", report.repaired)
+    for reason, count in report.dropped.items():
+        metrics.inc("questions_dropped", count)
+        metrics.inc(f"questions_dropped_{reason}", count)
+
+
+def _max_tokens(num_questions: int) -> int:
+    """Completion budget for a request asking for `num_questions`: LLM_MAX_TOKENS
+    covers a full quiz of MAX_QUESTIONS, smaller requests get their share."""
+    return min(settings.LLM_MAX_TOKENS, -(-settings.LLM_MAX_TOKENS * num_questions // MAX_QUESTIONS))
+
+
+def _request_cost(messages: list, max_tokens: int) -> int:
+    """Tokens a request can consume: its prompt plus the completion budget."""
+    return sum(count_tokens(m["content"]) for m in messages) + max_tokens
+
+
+async def _call_chat_api(messages: list, max_tokens: int, user_id: Optional[str], priority: str) -> str:
+    """Call HuggingFace chat completions API via new router endpoint, once the
+    scheduler admits it, with retries, circuit breaking and optional hedging."""
+    async with llm_scheduler.scheduler.slot(user_id, priority, _request_cost(messages, max_tokens)):
+        return await llm_transport.send(lambda: _post_chat(messages, max_tokens))
+
+
+async def _post_chat(messages: list, max_tokens: int) -> str:
+    response = await _get_client().post(
+        settings.HF_API_URL,
         json={
             "model": settings.HF_MODEL_ID,
             "messages": messages,
-            "max_tokens": 3000,
-            "temperature": 0.3,
+            "max_tokens": max_tokens,
+            "temperature": settings.LLM_TEMPERATURE,
         },
-        timeout=60.0,
     )
     response.raise_for_status()
     return response.json()["choices"][0]["message"]["content"]
 
 
-async def generate_questions_from_text(raw_text: str, num_questions: int, difficulty: str) -> List[Dict]:
-    messages = _build_messages(raw_text, num_questions, difficulty)
-    raw_response = _call_chat_api(messages)
+async def _stream_chat_api(
+    messages: list, max_tokens: int, user_id: Optional[str], priority: str
+) -> AsyncIterator[str]:
+    """Call the chat completions API with stream=true and yield content deltas.
+    The scheduler slot is held until the stream ends."""
+    async with llm_scheduler.scheduler.slot(user_id, priority, _request_cost(messages, max_tokens)):
+        async with aclosing(llm_transport.stream(lambda: _open_chat_stream(messages, max_tokens))) as deltas:
+            async for delta in deltas:
+                yield delta
+
+
+async def _open_chat_stream(messages: list, max_tokens: int) -> AsyncIterator[str]:
+    async with _get_client().stream(
+        "POST",
+        settings.HF_API_URL,
+        json={
+            "model": settings.HF_MODEL_ID,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": settings.LLM_TEMPERATURE,
+            "stream": True,
+        },
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+async def _fetch(messages: list, key: str, num_questions: int, user_id: Optional[str], priority: str) -> str:
+    """One upstream call. A usable response is cached before returning, so
+    callers waiting on it in other workers can pick it up."""
+    raw_response = await _call_chat_api(messages, _max_tokens(num_questions), user_id, priority)
+    report = parse_questions(raw_response, num_questions)
+    _record_parse(report)
+    if settings.GEN_CACHE_ENABLED and report.questions:
+        await generation_cache.put(key, settings.HF_MODEL_ID, raw_response)
+    return raw_response
+
+
+async def _fetch_coalesced(
+    messages: list, key: str, num_questions: int, user_id: Optional[str], priority: str
+) -> str:
+    def fetch():
+        return _fetch(messages, key, num_questions, user_id, priority)
+
+    if settings.SINGLEFLIGHT_DISTRIBUTED and settings.GEN_CACHE_ENABLED:
+        return await distributed(key, fetch, generation_cache.get_shared)
+    return await fetch()
+
+
+async def _generate(
+    messages: list, num_questions: int, use_cache: bool, user_id: Optional[str], priority: str
+) -> List[Dict]:
+    """Run one prompt, serving it from the generation cache when allowed.
+
+    Identical concurrent prompts share a single upstream call. A bypassed
+    request is neither served from the cache nor coalesced, but still
+    refreshes the cache with its fresh response.
+    """
+    key = make_key(messages, settings.HF_MODEL_ID, settings.LLM_TEMPERATURE, _max_tokens(num_questions))
+    if settings.GEN_CACHE_ENABLED and use_cache:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            questions = _parse_questions(cached, num_questions)
+            if questions:
+                return questions
+
+    if use_cache:
+        raw_response = await llm_flight.do(
+            key, lambda: _fetch_coalesced(messages, key, num_questions, user_id, priority)
+        )
+    else:
+        raw_response = await _fetch(messages, key, num_questions, user_id, priority)
     return _parse_questions(raw_response, num_questions)
 
 
-async def generate_questions_from_topic(topic: str, num_questions: int, difficulty: str) -> List[Dict]:
+def _question_fingerprint(question: Dict) -> str:
+    return re.sub(r"\W+", " ", question["question"].lower()).strip()
+
+
+def _merge_questions(batches: List[List[Dict]], num_questions: int) -> List[Dict]:
+    """Concatenate per-chunk results in document order, dropping near-identical questions."""
+    merged = []
+    seen = set()
+    for batch in batches:
+        for question in batch:
+            key = _question_fingerprint(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(question)
+    return merged[:num_questions]
+
+
+def _plan_chunks(raw_text: str, num_questions: int):
+    """Split the document into regions of GEN_CHUNK_TOKENS, each with its share
+    of the questions. A region's prompt context is its most informative
+    passages, packed into GEN_CONTEXT_TOKENS by the passage selector.
+
+    CPU-bound on first sight of a document; run it off the event loop.
+    Text with no passages (empty or whitespace) plans no chunks.
+    """
+    if not raw_text.strip():
+        return []
+    index = passage_selector.get_index(raw_text)
+    groups = group_consecutive(index.tokens.tolist(), settings.GEN_CHUNK_TOKENS)
+    sizes = [int(index.tokens[group].sum()) for group in groups]
+    return [
+        (index.select(settings.GEN_CONTEXT_TOKENS, groups[i]), count)
+        for i, count in allocate_questions(sizes, num_questions)
+    ]
+
+
+async def generate_questions_from_text(
+    raw_text: str,
+    num_questions: int,
+    difficulty: str,
+    use_cache: bool = True,
+    user_id: Optional[str] = None,
+    priority: str = llm_scheduler.INTERACTIVE,
+) -> List[Dict]:
+    """Map-reduce over the whole document: one prompt per chunk, run in
+    parallel under GEN_CHUNK_CONCURRENCY, then merged and deduplicated.
+
+    `user_id` and `priority` decide how the LLM scheduler queues and budgets
+    the upstream calls.
+    """
+    plan = await asyncio.to_thread(_plan_chunks, raw_text, num_questions)
+    semaphore = asyncio.Semaphore(settings.GEN_CHUNK_CONCURRENCY)
+
+    async def run(chunk: str, count: int) -> List[Dict]:
+        async with semaphore:
+            messages = _build_messages(chunk, count, difficulty)
+            return await _generate(messages, count, use_cache, user_id, priority)
+
+    results = await asyncio.gather(*(run(chunk, count) for chunk, count in plan), return_exceptions=True)
+    for r in results:
+        if isinstance(r, llm_scheduler.BudgetExceededError):
+            raise r  # a 429 beats a quiz silently missing the rejected chunks' questions
+    batches = [r for r in results if not isinstance(r, BaseException)]
+    if not batches and results:
+        raise results[0]
+    return _merge_questions(batches, num_questions)
+
+
+async def generate_questions_from_topic(
+    topic: str,
+    num_questions: int,
+    difficulty: str,
+    use_cache: bool = True,
+    user_id: Optional[str] = None,
+    priority: str = llm_scheduler.INTERACTIVE,
+) -> List[Dict]:
     messages = _build_topic_messages(topic, num_questions, difficulty)
-    raw_response = _call_chat_api(messages)
-    return _parse_questions(raw_response, num_questions)
+    return await _generate(messages, num_questions, use_cache, user_id, priority)
+
+
+async def _generate_stream(
+    messages: list, num_questions: int, use_cache: bool, user_id: Optional[str], priority: str
+) -> AsyncIterator[Dict]:
+    """Streaming counterpart of `_generate`: yields each validated question as
+    soon as the model has finished writing it."""
+    max_tokens = _max_tokens(num_questions)
+    key = make_key(messages, settings.HF_MODEL_ID, settings.LLM_TEMPERATURE, max_tokens)
+    if settings.GEN_CACHE_ENABLED and use_cache:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            questions = _parse_questions(cached, num_questions)
+            if questions:
+                for question in questions:
+                    yield question
+                return
+
+    parser = QuestionStreamParser(num_questions)
+    chunks = []
+    emitted = 0
+    if use_cache:
+        upstream = llm_flight.stream(key, lambda: _stream_chat_api(messages, max_tokens, user_id, priority))
+    else:
+        upstream = _stream_chat_api(messages, max_tokens, user_id, priority)
+    async with aclosing(upstream) as deltas:
+        async for delta in deltas:
+            chunks.append(delta)
+            for question in parser.feed(delta):
+                emitted += 1
+                yield question
+            if parser.done:
+                break
+    report = parser.finish()
+    for question in report.questions[emitted:]:  # recovered only when the response ended
+        emitted += 1
+        yield question
+    _record_parse(report)
+
+    if settings.GEN_CACHE_ENABLED and emitted:
+        await generation_cache.put(key, settings.HF_MODEL_ID, "".join(chunks))
+
+
+async def _merge_streams(streams: list, num_questions: int) -> AsyncIterator[Dict]:
+    """Interleave several question streams as items arrive, dropping duplicates."""
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    semaphore = asyncio.Semaphore(settings.GEN_CHUNK_CONCURRENCY)
+
+    async def pump(stream):
+        try:
+            async with semaphore:
+                async with aclosing(stream) as questions:
+                    async for question in questions:
+                        await queue.put(question)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    seen = set()
+    errors = []
+    emitted = 0
+    done = 0
+    try:
+        while done < len(tasks) and emitted < num_questions:
+            item = await queue.get()
+            if item is finished:
+                done += 1
+            elif isinstance(item, Exception):
+                errors.append(item)
+            else:
+                key = _question_fingerprint(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                emitted += 1
+                yield item
+        if not emitted and errors:
+            raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_questions_from_text(
+    raw_text: str,
+    num_questions: int,
+    difficulty: str,
+    use_cache: bool = True,
+    user_id: Optional[str] = None,
+    priority: str = llm_scheduler.INTERACTIVE,
+) -> AsyncIterator[Dict]:
+    plan = await asyncio.to_thread(_plan_chunks, raw_text, num_questions)
+    if not plan:
+        return
+    streams = [
+        _generate_stream(_build_messages(chunk, count, difficulty), count, use_cache, user_id, priority)
+        for chunk, count in plan
+    ]
+    merged = streams[0] if len(streams) == 1 else _merge_streams(streams, num_questions)
+    async with aclosing(merged) as questions:
+        async for question in questions:
+            yield question
+
+
+def stream_questions_from_topic(
+    topic: str,
+    num_questions: int,
+    difficulty: str,
+    use_cache: bool = True,
+    user_id: Optional[str] = None,
+    priority: str = llm_scheduler.INTERACTIVE,
+) -> AsyncIterator[Dict]:
+    messages = _build_topic_messages(topic, num_questions, difficulty)
+    return _generate_stream(messages, num_questions, use_cache, user_id, priority)
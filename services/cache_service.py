@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from core import metrics
+from core.config import settings
+from db.base import SessionLocal
+from models.generation_cache import GenerationCacheEntry
+
+
+def make_key(messages: list, model_id: str, temperature: float, max_tokens: int) -> str:
+    """Content address of a chat completion request."""
+    payload = json.dumps(
+        {"messages": messages, "model": model_id, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier cache of raw LLM responses: in-process LRU in front of the
+    `generation_cache` table, which survives restarts and is shared by workers."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+
+    # ── In-process tier ──────────────────────────────────────
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def _memory_put(self, key: str, response: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ── Persistent tier ──────────────────────────────────────
+    def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        db = SessionLocal()
+        try:
+            row = db.query(GenerationCacheEntry.response, GenerationCacheEntry.expires_at).filter(
+                GenerationCacheEntry.key == key,
+                GenerationCacheEntry.expires_at > datetime.now(timezone.utc),
+            ).first()
+            return (row.response, row.expires_at.timestamp()) if row else None
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, model_id: str, response: str, expires_at: datetime):
+        db = SessionLocal()
+        try:
+            stmt = insert(GenerationCacheEntry).values(
+                key=key, model_id=model_id, response=response, expires_at=expires_at,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[GenerationCacheEntry.key],
+                set_={"response": stmt.excluded.response, "expires_at": stmt.excluded.expires_at},
+            )
+            db.execute(stmt)
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self) -> int:
+        db = SessionLocal()
+        try:
+            deleted = db.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.expires_at <= datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    # ── Public API ───────────────────────────────────────────
+    async def get(self, key: str) -> Optional[str]:
+        response = self._memory_get(key)
+        if response is not None:
+            metrics.inc("gen_cache_hits_memory")
+            return response
+
+        try:
+            found = await asyncio.to_thread(self._db_get, key)
+        except Exception:
+            found = None  # cache must never break generation
+        if found is not None:
+            response, expires_at = found
+            self._memory_put(key, response, expires_at)
+            metrics.inc("gen_cache_hits_db")
+            return response
+
+        metrics.inc("gen_cache_misses")
+        return None
+
+    async def get_shared(self, key: str) -> Optional[str]:
+        """Look only at the persistent tier, e.g. for a result written by another worker."""
+        try:
+            found = await asyncio.to_thread(self._db_get, key)
+        except Exception:
+            return None
+        if found is None:
+            return None
+        response, expires_at = found
+        self._memory_put(key, response, expires_at)
+        return response
+
+    async def put(self, key: str, model_id: str, response: str):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        self._memory_put(key, response, expires_at.timestamp())
+        try:
+            await asyncio.to_thread(self._db_put, key, model_id, response, expires_at)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        hits = metrics.get("gen_cache_hits_memory") + metrics.get("gen_cache_hits_db")
+        misses = metrics.get("gen_cache_misses")
+        return {
+            "size": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+
+generation_cache = GenerationCache(
+    max_entries=settings.GEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GEN_CACHE_TTL_SECONDS,
+)
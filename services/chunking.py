@@ -0,0 +1,85 @@
+import re
+from typing import List, Tuple
+
+from services.tokenizer import count_tokens
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_oversized(paragraph: str, max_tokens: int) -> List[str]:
+    """Break a paragraph that alone exceeds the budget at sentence, then character, boundaries."""
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_SPLIT.split(paragraph):
+        candidate = f"{current} {sentence}".strip()
+        if count_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if count_tokens(sentence) <= max_tokens:
+            current = sentence
+        else:
+            step = max_tokens * 4
+            pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_paragraphs(text: str, max_tokens: int) -> List[str]:
+    """Paragraphs of `text`, with any paragraph longer than `max_tokens` broken up."""
+    paragraphs = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) // 4 > max_tokens and count_tokens(paragraph) > max_tokens:
+            paragraphs.extend(_split_oversized(paragraph, max_tokens))
+        else:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def group_consecutive(sizes: List[int], max_tokens: int) -> List[List[int]]:
+    """Pack consecutive items (by token size) into groups of at most `max_tokens`."""
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, size in enumerate(sizes):
+        if current and current_tokens + size > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def allocate_questions(sizes: List[int], num_questions: int) -> List[Tuple[int, int]]:
+    """Divide `num_questions` among chunks of the given token sizes.
+
+    Returns (chunk index, question count) pairs; every returned chunk gets
+    at least one question. When there are more chunks than questions,
+    evenly spaced chunks are picked so the questions still span the whole
+    document.
+    """
+    if not sizes:
+        return []
+    if len(sizes) > num_questions:
+        step = len(sizes) / num_questions
+        return [(int(i * step), 1) for i in range(num_questions)]
+
+    total = sum(sizes)
+    spare = num_questions - len(sizes)  # one question per chunk is already reserved
+    shares = [spare * size / total for size in sizes]
+    counts = [1 + int(share) for share in shares]
+    # Largest remainder for whatever is left after flooring
+    leftover = num_questions - sum(counts)
+    by_remainder = sorted(range(len(sizes)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    for i in by_remainder[:leftover]:
+        counts[i] += 1
+    return list(enumerate(counts))
@@ -0,0 +1,431 @@
+import asyncio
+import hashlib
+import io
+import itertools
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from core import metrics
+from core.config import settings
+
+# Text extraction (PDF parsing, OCR) is CPU-bound and can take seconds, so it
+# runs in a pool of worker processes created by main.lifespan instead of on
+# the event loop. Each job is bounded by EXTRACT_TIMEOUT_SECONDS (SIGALRM in
+# the worker, plus a hard deadline in the parent) and each worker by an
+# address-space limit. A job whose client disconnects is cancelled: dropped
+# from the queue if it hasn't started, interrupted with SIGUSR1 if it has.
+#
+# PDFs are split into batches of pages that fan out over the pool. Pages
+# without a text layer are OCR'd from their embedded images, and batches
+# stop being scheduled once SOURCE_TEXT_MAX_CHARS have been collected.
+
+DISCONNECT_POLL_SECONDS = 0.5
+DEADLINE_GRACE_SECONDS = 5
+PDF_PAGES_PER_JOB = 8
+OCR_MIN_PAGE_CHARS = 20  # pages with less extracted text are treated as scanned
+PAGE_SEPARATOR = "\n\f\n"
+
+
+class ExtractionError(Exception):
+    """Extraction failed in a way worth telling the user about."""
+
+
+class ExtractionCancelled(Exception):
+    """The client went away before extraction finished."""
+
+
+class PageResult(NamedTuple):
+    number: int  # 1-based
+    text: str
+    seconds: float
+    ocr: bool
+
+
+def _ocr_cache_path(data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    # The key includes the preprocessing switch: its output differs from raw OCR
+    suffix = "p" if settings.OCR_PREPROCESS else "r"
+    return os.path.join(settings.UPLOAD_DIR, "ocr_cache", digest[:2], f"{digest}.{suffix}.txt")
+
+
+def _ocr_image_bytes(data: bytes) -> str:
+    cache_path = _ocr_cache_path(data) if settings.OCR_CACHE_ENABLED else None
+    if cache_path:
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+    import pytesseract
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        if settings.OCR_PREPROCESS:
+            from services import ocr_preprocess
+            image = ocr_preprocess.prepare(image)
+        text = pytesseract.image_to_string(image)
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.part"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, cache_path)
+    return text
+
+
+def _ocr_pdf_page(page) -> str:
+    """OCR a page without a text layer from the images embedded in it."""
+    texts = []
+    for image in page.images:
+        try:
+            texts.append(_ocr_image_bytes(image.data))
+        except Exception:
+            continue
+    return "\n".join(t for t in texts if t.strip())
+
+
+def _pdf_page_count(file_path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[PageResult]:
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    results = []
+    for i in range(start, stop):
+        started = time.perf_counter()
+        page = reader.pages[i]
+        text = page.extract_text() or ""
+        ocr = False
+        if len(text.strip()) < OCR_MIN_PAGE_CHARS:
+            ocr = True
+            text = _ocr_pdf_page(page) or text
+        results.append(PageResult(i + 1, text, time.perf_counter() - started, ocr))
+    return results
+
+
+def _extract_text_from_pdf(file_path: str) -> str:
+    """Sequential PDF extraction, used when no worker pool is running."""
+    texts = []
+    collected = 0
+    for page in _extract_pdf_pages(file_path, 0, _pdf_page_count(file_path)):
+        texts.append(page.text)
+        collected += len(page.text)
+        if collected >= settings.SOURCE_TEXT_MAX_CHARS:
+            break
+    return PAGE_SEPARATOR.join(texts)
+
+
+def _extract_text_from_docx(file_path: str) -> str:
+    import docx
+    document = docx.Document(file_path)
+    parts = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            parts.append("\t".join(cell.text for cell in row.cells))
+    return "\n".join(part for part in parts if part.strip())
+
+
+def _extract_text_from_image(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return _ocr_image_bytes(f.read())
+
+
+def _langchain_docx(file_path: str) -> str:
+    from langchain_community.document_loaders import Docx2txtLoader
+    docs = Docx2txtLoader(file_path).load()
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def _langchain_pdf(file_path: str) -> str:
+    from langchain_community.document_loaders import PyPDFLoader
+    docs = PyPDFLoader(file_path).load()
+    return PAGE_SEPARATOR.join(doc.page_content for doc in docs)
+
+
+def _langchain_image(file_path: str) -> str:
+    from langchain_community.document_loaders import UnstructuredImageLoader
+    docs = UnstructuredImageLoader(file_path).load()
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+# Backends per source type, tried in order until one succeeds. The native
+# ones need only pypdf, python-docx and pytesseract; LangChain loaders are
+# registered behind them as fallbacks and only imported when reached, so
+# workers never pay for langchain_community unless a native backend fails.
+# With the worker pool running, the native PDF backend runs page-parallel
+# (extract_pdf); every other backend runs as one pool job.
+
+Extractor = Callable[[str], str]
+_extractors: Dict[str, List[Tuple[Extractor, bool]]] = {}
+
+
+def register_extractor(source_type: str, fn: Extractor, fallback: bool = False):
+    """Add a backend for `source_type`. Fallbacks are skipped when
+    EXTRACT_LANGCHAIN_FALLBACK is off."""
+    _extractors.setdefault(source_type, []).append((fn, fallback))
+
+
+register_extractor("pdf", _extract_text_from_pdf)
+register_extractor("pdf", _langchain_pdf, fallback=True)
+register_extractor("docx", _extract_text_from_docx)
+register_extractor("docx", _langchain_docx, fallback=True)
+register_extractor("image", _extract_text_from_image)
+register_extractor("image", _langchain_image, fallback=True)
+
+
+def _backends(source_type: str) -> List[Extractor]:
+    return [
+        fn for fn, fallback in _extractors.get(source_type, [])
+        if not fallback or settings.EXTRACT_LANGCHAIN_FALLBACK
+    ]
+
+
+def extract_text(source_type: str, file_path: str) -> str:
+    error = None
+    for fn in _backends(source_type):
+        try:
+            return fn(file_path)
+        except Exception as e:
+            error = e
+    if error is not None:
+        raise error
+    return ""
+
+
+# --- Worker process side ---
+
+class _Interrupt(BaseException):
+    """Raised from signal handlers; a BaseException so extractors' broad
+    `except Exception` fallbacks don't swallow it."""
+
+
+class _Timeout(_Interrupt):
+    pass
+
+
+class _Cancel(_Interrupt):
+    pass
+
+
+_slot = 0
+_tokens = None  # per-slot token of the job being run, 0 when idle
+_cancels = None  # per-slot token the parent asked to cancel
+_current = 0
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def _on_cancel(signum, frame):
+    if _current and _cancels[_slot] == _current:
+        raise _Cancel()
+
+
+def _init_worker(tokens, cancels, pids, next_slot, memory_limit_mb: int):
+    global _slot, _tokens, _cancels
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # shutdown is driven by the parent
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.signal(signal.SIGUSR1, _on_cancel)
+    with next_slot.get_lock():
+        _slot = next_slot.value % len(pids)
+        next_slot.value += 1
+    _tokens, _cancels = tokens, cancels
+    pids[_slot] = os.getpid()
+    if memory_limit_mb:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_job(token: int, timeout: int, fn: Callable, *args):
+    global _current
+    _current = token
+    _tokens[_slot] = token
+    signal.alarm(timeout)
+    try:
+        return fn(*args)
+    except _Timeout:
+        raise ExtractionError(f"Text extraction took longer than {timeout} seconds. Please try a smaller file.")
+    except _Cancel:
+        raise ExtractionCancelled()
+    except MemoryError:
+        raise ExtractionError("This file needs too much memory to process. Please try a smaller file.")
+    finally:
+        signal.alarm(0)
+        _tokens[_slot] = 0
+        _current = 0
+
+
+# --- Parent side ---
+
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = 0
+_tokens_shared = None
+_cancels_shared = None
+_pids_shared = None
+_job_tokens = itertools.count(1)
+
+
+def start():
+    """Create the worker pool; called from main.lifespan."""
+    global _executor, _workers, _tokens_shared, _cancels_shared, _pids_shared
+    _workers = settings.EXTRACT_WORKERS or os.cpu_count() or 1
+    # spawn: forking a process that already runs threads and an event loop is unsafe
+    context = multiprocessing.get_context("spawn")
+    _tokens_shared = context.Array("q", _workers, lock=False)
+    _cancels_shared = context.Array("q", _workers, lock=False)
+    _pids_shared = context.Array("i", _workers, lock=False)
+    _executor = ProcessPoolExecutor(
+        max_workers=_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(_tokens_shared, _cancels_shared, _pids_shared, context.Value("i", 0),
+                  settings.EXTRACT_MEMORY_LIMIT_MB),
+    )
+
+
+def stop():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _interrupt(token: int):
+    """Ask whichever worker is running job `token` to abandon it."""
+    for slot, running in enumerate(_tokens_shared):
+        if running == token:
+            _cancels_shared[slot] = token
+            try:
+                os.kill(_pids_shared[slot], signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+
+
+async def _submit(
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]], fn: Callable, *args
+):
+    """Run `fn(*args)` as one pool job, with deadline, cancellation and
+    disconnect handling."""
+    timeout = settings.EXTRACT_TIMEOUT_SECONDS
+    token = next(_job_tokens)
+    loop = asyncio.get_running_loop()
+    executor = _executor
+    future = loop.run_in_executor(executor, _run_job, token, timeout, fn, *args)
+    deadline = loop.time() + timeout + DEADLINE_GRACE_SECONDS
+    metrics.inc("extract_jobs")
+    try:
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return future.result()
+            if is_disconnected is not None and await is_disconnected():
+                metrics.inc("extract_jobs_cancelled")
+                raise ExtractionCancelled()
+            if loop.time() > deadline:
+                metrics.inc("extract_jobs_timed_out")
+                raise ExtractionError(f"Text extraction took longer than {timeout} seconds. Please try a smaller file.")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed by the OOM killer); replace the whole pool
+        if _executor is executor:
+            metrics.inc("extract_pool_restarts")
+            stop()
+            start()
+        raise ExtractionError("Text extraction failed. Please try a different file.")
+    finally:
+        if not future.done():
+            future.cancel()
+            _interrupt(token)
+
+
+def _record_pages(pages: List[PageResult]):
+    for page in pages:
+        metrics.inc("extract_pages")
+        metrics.inc("extract_page_seconds", page.seconds)
+        if page.ocr:
+            metrics.inc("extract_pages_ocr")
+    if pages:
+        slowest = max(page.seconds for page in pages)
+        metrics.set_gauge("extract_page_seconds_max", max(slowest, metrics.get("extract_page_seconds_max")))
+
+
+async def extract_pdf(
+    file_path: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> Tuple[str, List[PageResult]]:
+    """Page-parallel PDF extraction over the worker pool.
+
+    At most one batch per worker is in flight for a document, so one large
+    upload can't monopolize the pool, and batches are consumed in page
+    order so scheduling stops as soon as SOURCE_TEXT_MAX_CHARS is reached.
+    Returns the text (pages joined by PAGE_SEPARATOR) and per-page results.
+    """
+    page_count = await _submit(is_disconnected, _pdf_page_count, file_path)
+    batches = iter(range(0, page_count, PDF_PAGES_PER_JOB))
+
+    def schedule():
+        start = next(batches, None)
+        if start is not None:
+            stop = min(start + PDF_PAGES_PER_JOB, page_count)
+            in_flight.append(asyncio.ensure_future(
+                _submit(is_disconnected, _extract_pdf_pages, file_path, start, stop)
+            ))
+
+    in_flight: deque = deque()
+    for _ in range(_workers):
+        schedule()
+
+    pages: List[PageResult] = []
+    collected = 0
+    try:
+        while in_flight and collected < settings.SOURCE_TEXT_MAX_CHARS:
+            batch = await in_flight.popleft()
+            pages.extend(batch)
+            collected += sum(len(page.text) for page in batch)
+            schedule()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+    if in_flight:
+        metrics.inc("extract_early_stops")
+    _record_pages(pages)
+    return PAGE_SEPARATOR.join(page.text for page in pages), pages
+
+
+async def run(
+    source_type: str, file_path: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> str:
+    """Extract text from an uploaded file in the worker pool.
+
+    `is_disconnected` (e.g. `Request.is_disconnected`) is polled while the
+    job is queued or running; if it reports True the job is cancelled and
+    ExtractionCancelled is raised.
+    """
+    if _executor is None:
+        return await asyncio.to_thread(extract_text, source_type, file_path)
+    error = None
+    for fn in _backends(source_type):
+        try:
+            if fn is _extract_text_from_pdf:
+                text, _ = await extract_pdf(file_path, is_disconnected)
+                return text
+            return await _submit(is_disconnected, fn, file_path)
+        except (ExtractionError, ExtractionCancelled):
+            raise  # timeouts, memory limits and cancellation don't fall back
+        except Exception as e:
+            metrics.inc("extract_backend_failures")
+            error = e
+    if error is not None:
+        raise error
+    return ""
@@ -0,0 +1,181 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from core import metrics
+from core.config import settings
+from db.base import SessionLocal
+from models.generation_job import GenerationJob
+from models.user import User
+from schemas.quiz import QuizGenerateRequest
+from services import quiz_service
+
+# Quiz generation runs in a pool of worker tasks fed from the generation_jobs
+# table (claimed with FOR UPDATE SKIP LOCKED), so no external broker is needed
+# and every uvicorn worker can share the same queue. Jobs left "running" by a
+# worker that died are put back in the queue at startup and periodically.
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_running = 0
+
+
+def submit_job(db: Session, user: User, data: QuizGenerateRequest) -> GenerationJob:
+    if not data.source_id and not data.topic:
+        raise HTTPException(status_code=400, detail="Provide either a source_id or a topic")
+
+    job = GenerationJob(
+        user_id=user.id,
+        status="queued",
+        payload=data.model_dump(mode="json"),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    metrics.inc("jobs_submitted")
+    _notify()
+    return job
+
+
+def get_job(db: Session, user: User, job_id: str) -> GenerationJob:
+    job = db.query(GenerationJob).filter(
+        GenerationJob.id == job_id,
+        GenerationJob.user_id == user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _notify():
+    """Wake idle workers in this process; safe to call from the threadpool."""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def _claim_next_job() -> Optional[UUID]:
+    db = SessionLocal()
+    try:
+        job = (
+            db.query(GenerationJob)
+            .filter(GenerationJob.status == "queued")
+            .order_by(GenerationJob.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            return None
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job.attempts += 1
+        job_id = job.id
+        db.commit()
+        return job_id
+    finally:
+        db.close()
+
+
+def _requeue_stale_jobs() -> int:
+    """Put back jobs left 'running' by a worker that died mid-generation."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        count = db.query(GenerationJob).filter(
+            GenerationJob.status == "running",
+            GenerationJob.started_at < cutoff,
+        ).update({"status": "queued"}, synchronize_session=False)
+        db.commit()
+        if count:
+            metrics.inc("jobs_requeued", count)
+        return count
+    finally:
+        db.close()
+
+
+async def _run_job(job_id: UUID):
+    db = SessionLocal()
+    try:
+        job = db.get(GenerationJob, job_id)
+        user = db.get(User, job.user_id)
+        try:
+            data = QuizGenerateRequest(**job.payload)
+            session = await quiz_service.generate_quiz(db, user, data)
+            job.session_id = session.id
+            job.status = "done"
+            metrics.inc("jobs_done")
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back to the queue
+            db.rollback()
+            job.status = "queued"
+            db.commit()
+            raise
+        except HTTPException as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e.detail)
+            metrics.inc("jobs_failed")
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = f"Something went wrong: {str(e)}"
+            metrics.inc("jobs_failed")
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _worker_loop():
+    global _running
+    while True:
+        _wakeup.clear()
+        try:
+            job_id = await asyncio.to_thread(_claim_next_job)
+        except Exception:
+            job_id = None  # DB hiccup: back off and retry
+        if job_id is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        _running += 1
+        metrics.set_gauge("jobs_running", _running)
+        try:
+            await _run_job(job_id)
+        finally:
+            _running -= 1
+            metrics.set_gauge("jobs_running", _running)
+
+
+async def _requeue_loop():
+    while True:
+        await asyncio.sleep(settings.JOB_REQUEUE_INTERVAL_SECONDS)
+        try:
+            if await asyncio.to_thread(_requeue_stale_jobs):
+                _notify()
+        except Exception:
+            pass  # DB hiccup: try again next round
+
+
+async def start_workers():
+    global _wakeup, _loop
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    await asyncio.to_thread(_requeue_stale_jobs)
+    for _ in range(settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop()))
+    _workers.append(asyncio.create_task(_requeue_loop()))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from core import metrics
+from core.config import settings
+
+# Admission control in front of every upstream LLM call:
+#  - a global cap on calls in flight (per worker)
+#  - two priority lanes: interactive generation always goes first, background
+#    prefetch (pool refills) only gets leftover slots, up to its own cap
+#  - within a lane, self-clocked weighted fair queuing per user, weighted by
+#    token cost, so one user's burst can't starve everyone queued behind it
+#  - a token bucket per user, charged prompt + max_tokens up front
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_BACKGROUND_FLOW = "_background"
+
+
+class BudgetExceededError(Exception):
+    """Raised when a user's token budget would need too long to refill."""
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def reserve(self, cost: float) -> float:
+        """Take `cost` tokens, going into debt if needed; returns the seconds
+        until the debt is paid off."""
+        self._refill()
+        self.tokens -= min(cost, self.capacity)
+        return max(0.0, -self.tokens / self.refill_per_second)
+
+    def refund(self, cost: float):
+        self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ("future", "cancelled")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.cancelled = False
+
+
+class FairScheduler:
+    def __init__(self, max_concurrency: int, background_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.background_concurrency = background_concurrency
+        self._active = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._queues: Dict[str, List] = {INTERACTIVE: [], BACKGROUND: []}  # heaps of (finish tag, seq, waiter)
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}  # flow -> finish tag of its latest request
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._seq = itertools.count()
+
+    async def _charge(self, user_id: str, cost: int):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.full()}
+            bucket = self._buckets[user_id] = TokenBucket(
+                settings.LLM_USER_TOKEN_BURST, settings.LLM_USER_TOKENS_PER_MINUTE / 60,
+            )
+        wait = bucket.reserve(cost)
+        if wait > settings.LLM_BUDGET_MAX_WAIT_SECONDS:
+            bucket.refund(cost)
+            metrics.inc("llm_budget_rejected")
+            raise BudgetExceededError(
+                f"You're generating too quickly. Please try again in {int(wait) + 1} seconds."
+            )
+        if wait > 0:
+            metrics.inc("llm_budget_throttled")
+            await asyncio.sleep(wait)
+
+    def _has_capacity(self, priority: str) -> bool:
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        return priority == INTERACTIVE or self._active[BACKGROUND] < self.background_concurrency
+
+    def _publish_depth(self):
+        metrics.set_gauge("llm_queue_depth_interactive", self._waiting[INTERACTIVE])
+        metrics.set_gauge("llm_queue_depth_background", self._waiting[BACKGROUND])
+        metrics.set_gauge("llm_calls_active", sum(self._active.values()))
+
+    def _dispatch(self):
+        """Hand free slots to the waiters with the smallest finish tags,
+        interactive lane first."""
+        for lane in (INTERACTIVE, BACKGROUND):
+            queue = self._queues[lane]
+            while queue and self._has_capacity(lane):
+                tag, _, waiter = heapq.heappop(queue)
+                if waiter.cancelled:
+                    continue
+                self._waiting[lane] -= 1
+                self._active[lane] += 1
+                self._virtual_time = tag
+                waiter.future.set_result(None)
+        if not any(self._queues.values()):
+            self._last_finish.clear()
+        self._publish_depth()
+
+    async def _acquire(self, flow: str, priority: str, cost: int):
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        tag = self._last_finish[flow] = start + cost
+        if self._has_capacity(priority) and not self._waiting[INTERACTIVE] and not self._waiting[priority]:
+            self._active[priority] += 1
+            self._publish_depth()
+            return
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queues[priority], (tag, next(self._seq), waiter))
+        self._waiting[priority] += 1
+        self._publish_depth()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(priority)  # granted just as we were cancelled
+            else:
+                waiter.cancelled = True
+                self._waiting[priority] -= 1
+                self._publish_depth()
+            raise
+
+    def _release(self, priority: str):
+        self._active[priority] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str], priority: str, cost: int):
+        """Hold one upstream call slot for the duration of the block.
+
+        `cost` is the request's token cost (prompt + max_tokens). Background
+        calls are not charged to any user.
+        """
+        if user_id and priority == INTERACTIVE:
+            await self._charge(user_id, cost)
+        flow = user_id if priority == INTERACTIVE and user_id else _BACKGROUND_FLOW
+        queued_at = time.monotonic()
+        await self._acquire(flow, priority, cost)
+        metrics.inc(f"llm_queue_admitted_{priority}")
+        metrics.inc(f"llm_queue_wait_seconds_{priority}", time.monotonic() - queued_at)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+
+scheduler = FairScheduler(settings.LLM_CONCURRENCY, settings.LLM_BACKGROUND_CONCURRENCY)
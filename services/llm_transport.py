@@ -0,0 +1,223 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from core import metrics
+from core.config import settings
+
+# Resilience around every upstream LLM request:
+#  - retries only for 429 / 5xx / timeouts / connection errors, never other 4xx
+#  - exponential backoff with full jitter, honoring Retry-After
+#  - a circuit breaker that fails fast while the upstream is down
+#  - optional hedging: a second request after the observed p95 latency
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"  # closed, open, half_open
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        # Half-open: let a single probe through
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """The request was abandoned (cancelled) before an outcome: neither a
+        success nor a failure, but a half-open breaker may probe again."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            self.state = "closed"
+            metrics.set_gauge("llm_circuit_open", 0)
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            metrics.inc("llm_circuit_trips")
+            metrics.set_gauge("llm_circuit_open", 1)
+
+
+class LatencyTracker:
+    """Sliding window of successful request latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+latency = LatencyTracker()
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After if it asked for longer."""
+    backoff = random.uniform(0, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    delay = max(backoff, _retry_after(exc) or 0.0)
+    return min(delay, settings.LLM_RETRY_MAX_DELAY)
+
+
+def _check_breaker() -> bool:
+    """Raise if the breaker rejects the request; True if it is the half-open probe."""
+    if not breaker.allow():
+        metrics.inc("llm_circuit_rejected")
+        raise CircuitOpenError("AI service is temporarily unavailable. Please try again shortly.")
+    return breaker.state == "half_open"
+
+
+async def _timed(fn: Callable[[], Awaitable[T]]) -> T:
+    started = time.monotonic()
+    result = await fn()
+    latency.record(time.monotonic() - started)
+    return result
+
+
+async def _hedged(fn: Callable[[], Awaitable[T]]) -> T:
+    """Start a second identical request if the first is slower than the p95,
+    and return whichever succeeds first."""
+    pending = {asyncio.create_task(_timed(fn))}
+    try:
+        # Every request still running when we return, fail or are cancelled
+        # is cancelled below, so none is left holding a connection
+        done, pending = await asyncio.wait(pending, timeout=latency.quantile(settings.LLM_HEDGE_QUANTILE))
+        if not done:
+            metrics.inc("llm_hedged_requests")
+            pending.add(asyncio.create_task(_timed(fn)))
+        error: Optional[BaseException] = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def send(fn: Callable[[], Awaitable[T]]) -> T:
+    """Run a non-streaming request through the breaker, retries and hedging."""
+    attempt = 0
+    while True:
+        probe = _check_breaker()
+        try:
+            if settings.LLM_HEDGE_ENABLED:
+                result = await _hedged(fn)
+            else:
+                result = await _timed(fn)
+        except Exception as e:
+            if not _is_retryable(e):
+                breaker.record_success()  # upstream answered; the request itself was bad
+                raise
+            breaker.record_failure()
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            metrics.inc("llm_retries")
+            await asyncio.sleep(_retry_delay(e, attempt))
+            attempt += 1
+            continue
+        except BaseException:  # cancelled: the caller went away mid-request
+            if probe:
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def stream(fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """Streaming variant of `send`. Retries only happen before the first chunk;
+    once output has been yielded, errors propagate to the caller."""
+    attempt = 0
+    while True:
+        probe = _check_breaker()
+        started = False
+        try:
+            async with aclosing(fn()) as chunks:
+                async for chunk in chunks:
+                    if not started:
+                        started = True
+                        breaker.record_success()
+                    yield chunk
+            if not started:
+                breaker.record_success()
+            return
+        except Exception as e:
+            if not _is_retryable(e):
+                if not started:
+                    breaker.record_success()
+                raise
+            breaker.record_failure()
+            if started or attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            metrics.inc("llm_retries")
+            await asyncio.sleep(_retry_delay(e, attempt))
+            attempt += 1
+        except BaseException:  # cancelled or closed before an outcome
+            if probe:
+                breaker.release_probe()
+            raise
@@ -0,0 +1,114 @@
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from services.chunking import split_paragraphs
+from services.tokenizer import count_tokens_batch
+
+# Picks the prompt context for a document instead of truncating it: the text
+# is split into passages, scored with BM25 against the document's own most
+# salient terms, and packed into a token budget with maximal marginal
+# relevance so near-duplicate passages don't crowd each other out.
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how i if in into is it its itself just me more most my no nor not now of off on
+once only or other our out over own same she should so some such than that the their them then there
+these they this those through to too under until up very was we were what when where which while who
+whom why will with would you your
+""".split())
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+MAX_VOCAB = 4096
+QUERY_TERMS = 64
+MMR_LAMBDA = 0.7
+PASSAGE_MAX_TOKENS = 256
+
+
+class PassageIndex:
+    """BM25/TF-IDF index over the passages of one document."""
+
+    def __init__(self, passages: List[str]):
+        self.passages = passages
+        self.tokens = np.array(count_tokens_batch(passages), dtype=np.int64)
+        n = len(passages)
+
+        terms = [[w for w in _WORD.findall(p.lower()) if len(w) > 2 and w not in _STOPWORDS] for p in passages]
+        vocab = {t: i for i, (t, _) in enumerate(Counter(w for ts in terms for w in ts).most_common(MAX_VOCAB))}
+        tf = np.zeros((n, max(len(vocab), 1)), dtype=np.float32)
+        for row, passage_terms in enumerate(terms):
+            ids = [vocab[w] for w in passage_terms if w in vocab]
+            if ids:
+                tf[row] = np.bincount(ids, minlength=tf.shape[1])
+
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        lengths = tf.sum(axis=1)
+        avg_length = lengths.mean() or 1.0
+        saturation = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+        bm25 = idf * tf * (BM25_K1 + 1) / (tf + saturation[:, None])
+
+        # Query = the document's most salient terms, weighted by idf * total frequency
+        salience = tf.sum(axis=0) * idf
+        query = np.zeros_like(salience)
+        top = np.argsort(salience)[::-1][:QUERY_TERMS]
+        if salience[top].max(initial=0) > 0:
+            query[top] = salience[top] / salience[top].max()
+        relevance = bm25 @ query
+        self.relevance = relevance / (relevance.max() or 1.0)
+
+        vectors = tf * idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    def select(self, budget_tokens: int, candidates: Optional[Sequence[int]] = None) -> str:
+        """Best passages among `candidates` that fit `budget_tokens`, in document order."""
+        ids = np.array(range(len(self.passages)) if candidates is None else candidates, dtype=np.int64)
+        if self.tokens[ids].sum() <= budget_tokens:
+            return "\n\n".join(self.passages[i] for i in ids)
+
+        available = np.zeros(len(self.passages), dtype=bool)
+        available[ids] = True
+        max_similarity = np.zeros(len(self.passages), dtype=np.float32)
+        selected = []
+        remaining = budget_tokens
+        while True:
+            fits = available & (self.tokens <= remaining)
+            if not fits.any():
+                break
+            scores = MMR_LAMBDA * self.relevance - (1 - MMR_LAMBDA) * max_similarity
+            best = int(np.argmax(np.where(fits, scores, -np.inf)))
+            selected.append(best)
+            available[best] = False
+            remaining -= int(self.tokens[best])
+            max_similarity = np.maximum(max_similarity, self.vectors @ self.vectors[best])
+        return "\n\n".join(self.passages[i] for i in sorted(selected))
+
+
+_cache: "OrderedDict[str, PassageIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_index(text: str) -> PassageIndex:
+    """Index for `text`, built once per distinct document and kept in an LRU."""
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+
+    index = PassageIndex(split_paragraphs(text, PASSAGE_MAX_TOKENS))
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > settings.PASSAGE_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
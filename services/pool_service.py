@@ -0,0 +1,203 @@
+import asyncio
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core import metrics
+from core.config import settings
+from db.base import SessionLocal
+from models.pooled_question import PooledQuestion
+from models.study_source import StudySource
+from schemas.quiz import DIFFICULTIES
+from services import ai_service, llm_scheduler
+
+# Each StudySource keeps a pool of ready questions per difficulty. Quizzes are
+# drawn from the pool when it holds enough; whenever a pool falls below
+# POOL_LOW_WATERMARK it is topped back up to POOL_HIGH_WATERMARK in the
+# background. New uploads are warmed up front; a source sharing an existing
+# blob is only filled once a quiz draws on it.
+
+REFILL_BATCH_SIZE = 10
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_inflight: Set[Tuple[UUID, str]] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def start():
+    global _loop
+    _loop = asyncio.get_running_loop()
+
+
+async def stop():
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+
+
+def warm_source(source_id: UUID):
+    """Fill the pools of a freshly created source for every difficulty."""
+    for difficulty in DIFFICULTIES:
+        schedule_refill(source_id, difficulty)
+
+
+def schedule_refill(source_id: UUID, difficulty: str):
+    """Queue a background refill; safe to call from the threadpool or the event loop."""
+    if not settings.POOL_ENABLED or _loop is None:
+        return
+    _loop.call_soon_threadsafe(_start_refill, source_id, difficulty)
+
+
+def _start_refill(source_id: UUID, difficulty: str):
+    key = (source_id, difficulty)
+    if key in _inflight:
+        return
+    _inflight.add(key)
+    task = asyncio.create_task(_refill(source_id, difficulty))
+    _tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _tasks.discard(t)
+        _inflight.discard(key)
+
+    task.add_done_callback(_done)
+
+
+def draw_questions(db: Session, source_id: UUID, difficulty: str, count: int) -> Optional[List[Dict]]:
+    """Take `count` questions out of the pool inside the caller's transaction.
+
+    Returns None (and leaves the pool untouched) when it cannot cover the
+    whole quiz; the caller then generates live.
+    """
+    available = _pool_size(db, source_id, difficulty)
+    if available < count:
+        schedule_refill(source_id, difficulty)
+        return None
+
+    # Locked in a savepoint, so a partial grab can let go of its rows again:
+    # the caller goes on to generate live and must not keep them from others
+    savepoint = db.begin_nested()
+    rows = (
+        db.query(PooledQuestion)
+        .filter(PooledQuestion.source_id == source_id, PooledQuestion.difficulty == difficulty)
+        .order_by(PooledQuestion.created_at)
+        .limit(count)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if len(rows) < count:
+        savepoint.rollback()
+        return None  # concurrent quizzes hold the rest of the pool
+    savepoint.commit()
+
+    questions = [
+        {
+            "question": r.question_text,
+            "option_a": r.option_a,
+            "option_b": r.option_b,
+            "option_c": r.option_c,
+            "option_d": r.option_d,
+            "correct_option": r.correct_option,
+            "explanation": r.explanation or "",
+        }
+        for r in rows
+    ]
+    db.query(PooledQuestion).filter(
+        PooledQuestion.id.in_([r.id for r in rows])
+    ).delete(synchronize_session=False)
+
+    if available - count < settings.POOL_LOW_WATERMARK:
+        schedule_refill(source_id, difficulty)
+    return questions
+
+
+def _pool_size(db: Session, source_id: UUID, difficulty: str) -> int:
+    return db.query(func.count(PooledQuestion.id)).filter(
+        PooledQuestion.source_id == source_id,
+        PooledQuestion.difficulty == difficulty,
+    ).scalar()
+
+
+def _fingerprint(text: str) -> str:
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+def _load_refill_input(source_id: UUID, difficulty: str):
+    db = SessionLocal()
+    try:
+        source = db.get(StudySource, source_id)
+        if not source:
+            return None
+        existing = [
+            row.question_text
+            for row in db.query(PooledQuestion.question_text).filter(
+                PooledQuestion.source_id == source_id,
+                PooledQuestion.difficulty == difficulty,
+            )
+        ]
+        return source.source_type, source.extracted_text, source.topic, existing
+    finally:
+        db.close()
+
+
+def _store_questions(source_id: UUID, difficulty: str, questions: List[Dict]):
+    db = SessionLocal()
+    try:
+        if not db.get(StudySource, source_id):
+            return  # source deleted while we were generating
+        for q in questions:
+            db.add(PooledQuestion(
+                source_id=source_id,
+                difficulty=difficulty,
+                question_text=q["question"],
+                option_a=q["option_a"],
+                option_b=q["option_b"],
+                option_c=q["option_c"],
+                option_d=q["option_d"],
+                correct_option=q["correct_option"],
+                explanation=q.get("explanation", ""),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _refill(source_id: UUID, difficulty: str):
+    try:
+        loaded = await asyncio.to_thread(_load_refill_input, source_id, difficulty)
+        if loaded is None:
+            return
+        source_type, raw_text, topic, existing = loaded
+        needed = settings.POOL_HIGH_WATERMARK - len(existing)
+        seen = {_fingerprint(text) for text in existing}
+
+        while needed > 0:
+            batch = min(needed, REFILL_BATCH_SIZE)
+            # Pools must not repeat earlier quizzes, so never serve them from the cache
+            if source_type == "topic":
+                generated = await ai_service.generate_questions_from_topic(
+                    topic, batch, difficulty, use_cache=False, priority=llm_scheduler.BACKGROUND,
+                )
+            else:
+                generated = await ai_service.generate_questions_from_text(
+                    raw_text, batch, difficulty, use_cache=False, priority=llm_scheduler.BACKGROUND,
+                )
+
+            fresh = []
+            for q in generated:
+                key = _fingerprint(q["question"])
+                if key not in seen:
+                    seen.add(key)
+                    fresh.append(q)
+            if not fresh:
+                break
+            await asyncio.to_thread(_store_questions, source_id, difficulty, fresh)
+            metrics.inc("pool_questions_generated", len(fresh))
+            needed -= len(fresh)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        metrics.inc("pool_refill_errors")
@@ -0,0 +1,283 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+REQUIRED_KEYS = ["question", "option_a", "option_b", "option_c", "option_d", "correct_option"]
+_REQUIRED = frozenset(REQUIRED_KEYS)
+
+# Only these characters change the scanner's state; everything between them
+# is skipped with a regex search instead of a Python-level loop. Before the
+# array only an opening brace or bracket matters.
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+_OPENING = re.compile(r"[{\[]")
+_STRING_END = re.compile(r'["\\]')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_DOUBLE_COMMA = re.compile(r",(?:\s*,)+")
+_TOKEN = re.compile(r"[\w.+-]*")
+# strict=False accepts raw newlines/tabs inside strings, which models emit often
+_decoder = json.JSONDecoder(strict=False)
+
+
+def validate_question(q) -> Optional[Dict]:
+    """Normalize one question object from the model, or None if it is unusable."""
+    if not isinstance(q, dict) or not q.keys() >= _REQUIRED:
+        return None
+    correct = str(q["correct_option"]).strip().upper()
+    if correct not in ["A", "B", "C", "D"]:
+        correct = "A"
+    return {
+        "question": str(q["question"]),
+        "option_a": str(q["option_a"]),
+        "option_b": str(q["option_b"]),
+        "option_c": str(q["option_c"]),
+        "option_d": str(q["option_d"]),
+        "correct_option": correct,
+        "explanation": str(q.get("explanation", "")),
+    }
+
+
+def _is_prose(chunk: str, error: json.JSONDecodeError) -> bool:
+    """Whether a top-level brace whose object failed to decode can't be JSON
+    at all: the error lies inside the received text rather than where it was
+    cut off, and isn't a stray comma that _decode would repair."""
+    if not error.msg.startswith("Expecting"):
+        return False  # unterminated strings and escapes may just be truncated
+    pos = error.pos
+    if _TOKEN.match(chunk, pos).end() >= len(chunk):
+        return False  # a literal or number still arriving
+    before = pos - 1
+    while before >= 0 and chunk[before].isspace():
+        before -= 1
+    return chunk[pos] != "," and chunk[before] != ","
+
+
+class ParseReport:
+    """Outcome of parsing one model response."""
+
+    def __init__(self):
+        self.questions: List[Dict] = []
+        self.dropped: Dict[str, int] = {}  # reason -> count
+        self.repaired = 0  # objects accepted after fixing stray commas
+        self.found = False  # whether any array element or object was seen at all
+
+    @property
+    def dropped_count(self) -> int:
+        return sum(self.dropped.values())
+
+    def drop(self, reason: str):
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+
+
+class QuestionStreamParser:
+    """Single-pass, tolerant parser for a JSON array of question objects.
+
+    Text can be fed in arbitrary pieces (e.g. streamed completion deltas);
+    each object of the top-level array is validated and returned as soon as
+    its closing brace arrives. Anything before the opening `[` (prose, code
+    fences) is ignored, and bare objects without an enclosing array are
+    accepted too, including wrappers like `{"questions": [...]}`; a brace in
+    prose that turns out not to hold JSON (say `shape {"question": ...}:`)
+    is read as prose again, so an array after it is still found. A broken object only loses itself: stray commas are
+    repaired, and objects that still don't parse, miss required fields or
+    are cut off by truncation are counted in `report.dropped` by reason.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.report = ParseReport()
+        self._pieces: List[str] = []  # text of the element currently being read
+        self._depth = 0  # 0 = before the array, 1 = inside it, >= 2 = inside an element
+        self._in_string = False
+        self._escape = False
+        self._elements = 0  # elements seen in the current array
+        self._bare = False  # the open element started outside any array
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        questions = []
+        start = 0 if self._depth >= 2 else None  # where the open element begins in this chunk
+        pos = 0
+        end = len(chunk)
+        while pos < end and not self.done:
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+            if self._in_string:
+                pattern = _STRING_END
+            else:
+                pattern = _STRUCTURAL if self._depth else _OPENING
+            match = pattern.search(chunk, pos)
+            if match is None:
+                break
+            ch = match.group()
+            i = match.start()
+            pos = i + 1
+
+            if self._in_string:
+                if ch == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+            if ch == "\\":
+                continue
+            if ch == '"':
+                # Quotes in prose before the array don't open strings
+                self._in_string = self._depth >= 1
+                continue
+
+            if self._depth <= 1:
+                if ch == "]" and self._depth == 1:
+                    if self._elements:
+                        self.done = True
+                    else:
+                        self._depth = 0  # an empty or non-question array: keep looking
+                elif ch == "[" and self._depth == 0:
+                    # Fast path: the whole array arrived intact
+                    try:
+                        items, after = _decoder.raw_decode(chunk, i)
+                    except ValueError:
+                        self._depth = 1
+                        continue
+                    if any(isinstance(item, dict) for item in items):
+                        self.report.found = True
+                        for item in items:
+                            self._collect(self._accept(item), questions)
+                            if self.done:
+                                break
+                        self.done = True
+                    pos = after  # otherwise "[5]" in prose: skip it and keep looking
+                elif ch in "{[":
+                    # Only "{" gets here at depth 0: a bare object, or a brace in prose
+                    bare = self._depth == 0
+                    if not bare:
+                        self._elements += 1
+                        self.report.found = True
+                    if ch == "{":
+                        # Fast path: a complete, well-formed object is decoded in C
+                        # and skipped over; the scanner only walks broken or
+                        # partially received ones.
+                        try:
+                            obj, pos = _decoder.raw_decode(chunk, i)
+                        except json.JSONDecodeError as e:
+                            if bare and _is_prose(chunk, e):
+                                continue  # skip the brace; what follows is prose
+                        else:
+                            self._depth = 0 if bare else 1
+                            self.report.found = True
+                            if bare:
+                                self._collect_bare(obj, questions)
+                            else:
+                                self._collect(self._accept(obj), questions)
+                            continue
+                    self._depth = 2
+                    self._bare = bare
+                    pos = i + 1
+                    start = i
+                continue
+
+            if ch in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 1:
+                    self._pieces.append(chunk[start:pos])
+                    text = "".join(self._pieces)
+                    self._pieces = []
+                    start = None
+                    if self._bare:
+                        questions += self._close_bare(text)
+                        start = pos if self._depth >= 2 else None  # the rescan left an element open
+                        continue
+                    obj = self._decode(text)
+                    if obj is not None:
+                        self._collect(self._accept(obj), questions)
+
+        if start is not None and not self.done:
+            self._pieces.append(chunk[start:])
+        return questions
+
+    def _decode(self, text: str, quiet: bool = False):
+        try:
+            return _decoder.decode(text)
+        except ValueError:
+            pass
+        try:
+            obj = _decoder.decode(_TRAILING_COMMA.sub(r"\1", _DOUBLE_COMMA.sub(",", text)))
+        except ValueError:
+            if not quiet:
+                self.report.drop("malformed_json")
+            return None
+        self.report.repaired += 1
+        return obj
+
+    def _close_bare(self, text: str) -> List[Dict]:
+        """Finish an element opened outside any array: a bare object if it
+        decodes, otherwise a brace in prose, which is scanned again as prose
+        from just after the brace."""
+        self._depth = 0
+        self._bare = False
+        obj = self._decode(text, quiet=True)
+        if obj is None:
+            return self.feed(text[1:])
+        self.report.found = True
+        questions = []
+        self._collect_bare(obj, questions)
+        return questions
+
+    def _collect_bare(self, obj, questions: List[Dict]):
+        """A bare object is one question, or a wrapper such as
+        {"questions": [...]} whose list values hold the questions."""
+        if isinstance(obj, dict) and not obj.keys() >= _REQUIRED:
+            items = [item for value in obj.values() if isinstance(value, list) for item in value]
+            if any(isinstance(item, dict) for item in items):
+                for item in items:
+                    self._collect(self._accept(item), questions)
+                    if self.done:
+                        break
+                return
+        self._collect(self._accept(obj), questions)
+
+    def _accept(self, obj) -> Optional[Dict]:
+        question = validate_question(obj)
+        if question is None:
+            self.report.drop("missing_fields" if isinstance(obj, dict) else "not_an_object")
+            return None
+        self.report.questions.append(question)
+        return question
+
+    def _collect(self, question: Optional[Dict], questions: List[Dict]):
+        if question:
+            questions.append(question)
+            if self.limit is not None and len(self.report.questions) >= self.limit:
+                self.done = True
+
+    def finish(self) -> ParseReport:
+        """Close the parse; an element still open at this point was truncated.
+
+        A bare "element" still open may be an unclosed brace in prose, so
+        the text after it is scanned once more; callers streaming questions
+        should pick up any in `report.questions` that feed() didn't return.
+        """
+        if not self.done and self._bare and self._depth >= 2:
+            text = "".join(self._pieces)
+            self._pieces = []
+            self._depth = 0
+            self._bare = False
+            recovered = len(self.report.questions)
+            self.feed(text[1:])
+            if len(self.report.questions) == recovered and self._depth < 2:
+                self.report.drop("truncated")  # it was a bare object cut off after all
+        if not self.done and self._depth >= 2:
+            self.report.drop("truncated")
+        self.done = True
+        self._pieces = []
+        return self.report
+
+
+def parse_questions(text: str, limit: Optional[int] = None) -> ParseReport:
+    """Parse a complete model response with the same scanner used for streams."""
+    parser = QuestionStreamParser(limit)
+    parser.feed(text)
+    return parser.finish()
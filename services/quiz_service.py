@@ -1,7 +1,10 @@
+import base64
+from contextlib import aclosing
 from datetime import datetime, timezone
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException
 
 from models.quiz_session import QuizSession
@@ -10,10 +13,15 @@ from models.user_answer import UserAnswer
 from models.study_source import StudySource
 from models.user import User
 from schemas.quiz import QuizGenerateRequest, QuizSubmitRequest
-from services import ai_service
+from services import ai_service, pool_service, stats_service
+from services.llm_scheduler import BudgetExceededError
+from services.llm_transport import CircuitOpenError
+from core import metrics
+from core.config import settings
 
 
-async def generate_quiz(db: Session, user: User, data: QuizGenerateRequest) -> QuizSession:
+def _resolve_source(db: Session, user: User, data: QuizGenerateRequest):
+    """Returns (source, raw_text, topic_label) for a generate request."""
     if not data.source_id and not data.topic:
         raise HTTPException(status_code=400, detail="Provide either a source_id or a topic")
 
@@ -32,24 +40,74 @@ async def generate_quiz(db: Session, user: User, data: QuizGenerateRequest) -> Q
         if source.source_type == "topic":
             topic_label = source.topic
         else:
-            raw_text = source.raw_text
+            raw_text = source.extracted_text
             topic_label = source.file_name
 
     elif data.topic:
         topic_label = data.topic
 
-    # Generate questions via AI
-    try:
-        if raw_text:
-            questions_data = await ai_service.generate_questions_from_text(
-                raw_text, data.num_questions, data.difficulty
-            )
-        else:
-            questions_data = await ai_service.generate_questions_from_topic(
-                topic_label, data.num_questions, data.difficulty
-            )
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"AI generation failed: {str(e)}")
+    return source, raw_text, topic_label
+
+
+def _draw_from_pool(db: Session, source: StudySource, data: QuizGenerateRequest):
+    """Pre-generated questions for this quiz, or None to generate live."""
+    if not source or data.force_refresh or not settings.POOL_ENABLED:
+        return None
+    questions = pool_service.draw_questions(db, source.id, data.difficulty, data.num_questions)
+    metrics.inc("quizzes_served_pool" if questions else "quizzes_served_live")
+    return questions
+
+
+def _question_row(session_id: UUID, q: dict, order_index: int) -> dict:
+    return {
+        "session_id": session_id,
+        "question_text": q["question"],
+        "option_a": q["option_a"],
+        "option_b": q["option_b"],
+        "option_c": q["option_c"],
+        "option_d": q["option_d"],
+        "correct_option": q["correct_option"],
+        "explanation": q.get("explanation", ""),
+        "order_index": order_index,
+    }
+
+
+async def _iterate(items: List[dict]):
+    for item in items:
+        yield item
+
+
+async def generate_quiz(db: Session, user: User, data: QuizGenerateRequest) -> QuizSession:
+    source, raw_text, topic_label = _resolve_source(db, user, data)
+    user_id = user.id
+    source_id = source.id if source else None
+
+    # Serve from the source's question pool when it can cover the whole quiz
+    questions_data = _draw_from_pool(db, source, data)
+
+    if not questions_data:
+        # Nothing is pending (a short pool draw rolls back its locks), so end
+        # the transaction: the connection goes back to the pool for the length
+        # of the upstream call instead of idling in a transaction
+        db.commit()
+        # Generate questions via AI
+        try:
+            if raw_text:
+                questions_data = await ai_service.generate_questions_from_text(
+                    raw_text, data.num_questions, data.difficulty,
+                    use_cache=not data.force_refresh, user_id=str(user_id),
+                )
+            else:
+                questions_data = await ai_service.generate_questions_from_topic(
+                    topic_label, data.num_questions, data.difficulty,
+                    use_cache=not data.force_refresh, user_id=str(user_id),
+                )
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except BudgetExceededError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"AI generation failed: {str(e)}")
 
     if not questions_data:
         raise HTTPException(status_code=502, detail="AI returned no valid questions. Please try again.")
@@ -57,8 +115,8 @@ async def generate_quiz(db: Session, user: User, data: QuizGenerateRequest) -> Q
     # Create session
     title = f"{topic_label} — {data.difficulty.capitalize()} Quiz"
     session = QuizSession(
-        user_id=user.id,
-        source_id=source.id if source else None,
+        user_id=user_id,
+        source_id=source_id,
         title=title[:255],
         num_questions=len(questions_data),
         difficulty=data.difficulty,
@@ -69,47 +127,139 @@ async def generate_quiz(db: Session, user: User, data: QuizGenerateRequest) -> Q
     db.add(session)
     db.flush()  # Get session.id before inserting questions
 
-    # Insert questions
-    for i, q in enumerate(questions_data):
-        question = QuizQuestion(
-            session_id=session.id,
-            question_text=q["question"],
-            option_a=q["option_a"],
-            option_b=q["option_b"],
-            option_c=q["option_c"],
-            option_d=q["option_d"],
-            correct_option=q["correct_option"],
-            explanation=q.get("explanation", ""),
-            order_index=i + 1,
-        )
-        db.add(question)
+    # Insert all questions in one multi-row INSERT; ids are generated by the database
+    db.execute(insert(QuizQuestion), [_question_row(session.id, q, i + 1) for i, q in enumerate(questions_data)])
+    stats_service.count_quiz(db, user_id)
 
     db.commit()
-    db.refresh(session)
     return session
 
 
-def start_quiz(db: Session, user: User, session_id: str) -> QuizSession:
-    session = _get_session(db, user, session_id)
+async def stream_quiz(db: Session, user: User, data: QuizGenerateRequest) -> AsyncIterator[Tuple[str, dict]]:
+    """Generate a quiz question by question.
+
+    Yields ("session", ...) once the session row exists, then ("question", ...)
+    for every question as soon as it is persisted, and finally ("done", ...).
+    Questions are sent without their correct option. If generation stops
+    early, the session keeps the questions produced so far.
+    """
+    source, raw_text, topic_label = _resolve_source(db, user, data)
+    # Drawn rows are removed in the same commit that creates the session
+    pooled = _draw_from_pool(db, source, data)
+
+    title = f"{topic_label} — {data.difficulty.capitalize()} Quiz"[:255]
+    session = QuizSession(
+        user_id=user.id,
+        source_id=source.id if source else None,
+        title=title,
+        num_questions=data.num_questions,
+        difficulty=data.difficulty,
+        time_limit_seconds=data.time_limit_seconds,
+        total_questions=data.num_questions,
+        status="generating",
+    )
+    db.add(session)
+    stats_service.count_quiz(db, user.id)
+    db.commit()
+    session_id = session.id
+
+    count = 0
+    # Everything after the commit is inside the try, so a client that goes
+    # away at any point still gets its session finalized (or dropped)
+    try:
+        yield "session", {"id": str(session_id), "title": title, "time_limit_seconds": data.time_limit_seconds}
+
+        if pooled:
+            stream = _iterate(pooled)
+        elif raw_text:
+            stream = ai_service.stream_questions_from_text(
+                raw_text, data.num_questions, data.difficulty,
+                use_cache=not data.force_refresh, user_id=str(user.id),
+            )
+        else:
+            stream = ai_service.stream_questions_from_topic(
+                topic_label, data.num_questions, data.difficulty,
+                use_cache=not data.force_refresh, user_id=str(user.id),
+            )
+
+        async with aclosing(stream) as questions:
+            async for q in questions:
+                count += 1
+                question_id = db.scalar(
+                    insert(QuizQuestion).values(_question_row(session_id, q, count)).returning(QuizQuestion.id)
+                )
+                if count == 1:
+                    session.started_at = datetime.now(timezone.utc)
+                db.commit()
+                yield "question", {
+                    "id": str(question_id),
+                    "question_text": q["question"],
+                    "option_a": q["option_a"],
+                    "option_b": q["option_b"],
+                    "option_c": q["option_c"],
+                    "option_d": q["option_d"],
+                    "order_index": count,
+                }
+    except CircuitOpenError as e:
+        if not count:
+            raise HTTPException(status_code=503, detail=str(e))
+    except BudgetExceededError as e:
+        if not count:
+            raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        if not count:
+            raise HTTPException(status_code=502, detail=f"AI generation failed: {str(e)}")
+    finally:
+        _finish_streamed_session(db, session, count)
+
+    if not count:
+        raise HTTPException(status_code=502, detail="AI returned no valid questions. Please try again.")
+    yield "done", {"total": count}
+
+
+def _finish_streamed_session(db: Session, session: QuizSession, count: int):
+    # The session stays "generating" (and can't be submitted) until here, so
+    # it is graded against its final question count
+    if not count:
+        db.delete(session)
+        stats_service.count_quiz(db, session.user_id, -1)
+    else:
+        session.num_questions = count
+        session.total_questions = count
+        session.status = "in_progress"
+    db.commit()
+
+
+def start_quiz(db: Session, session: QuizSession) -> QuizSession:
+    """Mark a session loaded by get_quiz_for_attempt as started."""
     if session.status not in ["pending"]:
         raise HTTPException(status_code=400, detail="Quiz already started or completed")
 
     session.status = "in_progress"
     session.started_at = datetime.now(timezone.utc)
     db.commit()
-    db.refresh(session)
     return session
 
 
 def submit_quiz(db: Session, user: User, session_id: str, data: QuizSubmitRequest) -> QuizSession:
-    session = _get_session(db, user, session_id)
+    # Grading needs only each question's id and correct option. The row lock
+    # makes a second, concurrent submit wait and then see "completed", so a
+    # quiz is never graded (or counted in user_stats) twice.
+    session = _get_session(
+        db, user, session_id,
+        selectinload(QuizSession.questions).load_only(QuizQuestion.id, QuizQuestion.correct_option),
+        for_update=True,
+    )
     if session.status == "completed" or session.status == "timed_out":
         raise HTTPException(status_code=400, detail="Quiz already submitted")
+    if session.status == "generating":
+        raise HTTPException(status_code=409, detail="Quiz is still being generated")
 
     questions = {str(q.id): q for q in session.questions}
     score = 0
     answers_map = {str(a.question_id): a for a in data.answers}
 
+    answer_rows = []
     for question_id, question in questions.items():
         answer_data = answers_map.get(question_id)
         selected = answer_data.selected_option.upper() if answer_data and answer_data.selected_option else None
@@ -118,14 +268,17 @@ def submit_quiz(db: Session, user: User, session_id: str, data: QuizSubmitReques
         if is_correct:
             score += 1
 
-        user_answer = UserAnswer(
-            session_id=session.id,
-            question_id=question.id,
-            user_id=user.id,
-            selected_option=selected,
-            is_correct=is_correct,
-        )
-        db.add(user_answer)
+        answer_rows.append({
+            "session_id": session.id,
+            "question_id": question.id,
+            "user_id": user.id,
+            "selected_option": selected,
+            "is_correct": is_correct,
+        })
+
+    # One multi-row INSERT for the whole quiz
+    if answer_rows:
+        db.execute(insert(UserAnswer), answer_rows)
 
     percentage = round((score / session.total_questions) * 100, 2) if session.total_questions > 0 else 0
 
@@ -137,15 +290,27 @@ def submit_quiz(db: Session, user: User, session_id: str, data: QuizSubmitReques
     session.time_taken_seconds = data.time_taken_seconds
     session.status = "timed_out" if timed_out else "completed"
     session.completed_at = datetime.now(timezone.utc)
+    stats_service.record_result(db, session)
 
     db.commit()
-    db.refresh(session)
     return session
 
 
 def get_quiz_for_attempt(db: Session, user: User, session_id: str) -> QuizSession:
-    session = _get_session(db, user, session_id)
-    return session
+    """Session plus the question columns the attempt page shows (never the
+    correct option or explanation): two round trips."""
+    return _get_session(
+        db, user, session_id,
+        selectinload(QuizSession.questions).load_only(
+            QuizQuestion.id,
+            QuizQuestion.question_text,
+            QuizQuestion.option_a,
+            QuizQuestion.option_b,
+            QuizQuestion.option_c,
+            QuizQuestion.option_d,
+            QuizQuestion.order_index,
+        ),
+    )
 
 
 def get_quiz_review(db: Session, user: User, session_id: str):
@@ -153,11 +318,19 @@ def get_quiz_review(db: Session, user: User, session_id: str):
     if session.status not in ["completed", "timed_out"]:
         raise HTTPException(status_code=400, detail="Quiz not yet completed")
 
-    # Build review with answers attached
-    answers_map = {str(a.question_id): a for a in session.user_answers}
+    # Questions with the user's answer attached, in one query
+    rows = (
+        db.query(QuizQuestion, UserAnswer.selected_option, UserAnswer.is_correct)
+        .outerjoin(UserAnswer, and_(
+            UserAnswer.question_id == QuizQuestion.id,
+            UserAnswer.session_id == QuizQuestion.session_id,
+        ))
+        .filter(QuizQuestion.session_id == session.id)
+        .order_by(QuizQuestion.order_index)
+        .all()
+    )
     review_questions = []
-    for q in session.questions:
-        answer = answers_map.get(str(q.id))
+    for q, selected_option, is_correct in rows:
         review_questions.append({
             "id": q.id,
             "question_text": q.question_text,
@@ -168,32 +341,80 @@ def get_quiz_review(db: Session, user: User, session_id: str):
             "correct_option": q.correct_option,
             "explanation": q.explanation,
             "order_index": q.order_index,
-            "selected_option": answer.selected_option if answer else None,
-            "is_correct": answer.is_correct if answer else False,
+            "selected_option": selected_option,
+            "is_correct": is_correct or False,
         })
 
     return session, review_questions
 
 
-def get_user_history(db: Session, user: User, page: int = 1, per_page: int = 10):
-    offset = (page - 1) * per_page
-    total = db.query(QuizSession).filter(QuizSession.user_id == user.id).count()
-    sessions = (
-        db.query(QuizSession)
-        .filter(QuizSession.user_id == user.id)
-        .order_by(QuizSession.created_at.desc())
-        .offset(offset)
-        .limit(per_page)
-        .all()
-    )
-    return sessions, total
+def encode_cursor(session: QuizSession) -> str:
+    """Opaque history cursor: the session's position in (created_at, id) order."""
+    raw = f"{session.created_at.isoformat()}|{session.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
-def _get_session(db: Session, user: User, session_id: str) -> QuizSession:
-    session = db.query(QuizSession).filter(
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, session_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(session_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page cursor")
+
+
+def get_user_history(
+    db: Session, user: User, after: Optional[str] = None, before: Optional[str] = None, per_page: int = 10,
+) -> Tuple[List[QuizSession], Optional[str], Optional[str]]:
+    """One page of the user's sessions, newest first, by keyset pagination.
+
+    `after` continues past an older-page cursor, `before` goes back towards
+    newer sessions. Returns (sessions, next_cursor, prev_cursor); a cursor is
+    None when there is no page in that direction. Order is (created_at DESC,
+    id), exactly idx_quiz_sessions_user_created, so any page costs one index
+    range scan of per_page + 1 rows, however deep it is.
+    """
+    query = db.query(QuizSession).filter(QuizSession.user_id == user.id)
+    if before:
+        created_at, session_id = _decode_cursor(before)
+        query = query.filter(
+            QuizSession.created_at >= created_at,
+            or_(QuizSession.created_at > created_at, QuizSession.id < session_id),
+        ).order_by(QuizSession.created_at.asc(), QuizSession.id.desc())
+    else:
+        query = query.order_by(QuizSession.created_at.desc(), QuizSession.id)
+        if after:
+            created_at, session_id = _decode_cursor(after)
+            query = query.filter(
+                QuizSession.created_at <= created_at,
+                or_(QuizSession.created_at < created_at, QuizSession.id > session_id),
+            )
+
+    sessions = query.limit(per_page + 1).all()
+    has_more = len(sessions) > per_page
+    if before and not has_more:
+        # Back at the newest sessions: serve a full first page
+        return get_user_history(db, user, per_page=per_page)
+    sessions = sessions[:per_page]
+    if before:
+        sessions.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = bool(after), has_more
+
+    next_cursor = encode_cursor(sessions[-1]) if sessions and has_older else None
+    prev_cursor = encode_cursor(sessions[0]) if sessions and has_newer else None
+    return sessions, next_cursor, prev_cursor
+
+
+def _get_session(db: Session, user: User, session_id: str, *options, for_update: bool = False) -> QuizSession:
+    query = db.query(QuizSession).options(*options).filter(
         QuizSession.id == session_id,
         QuizSession.user_id == user.id
-    ).first()
+    )
+    if for_update:
+        query = query.with_for_update(of=QuizSession)
+    session = query.first()
     if not session:
         raise HTTPException(status_code=404, detail="Quiz session not found")
     return session
@@ -0,0 +1,186 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import exc, text
+
+from core import metrics
+from core.config import settings
+from db.base import engine, lock_engine
+
+# Coalesces identical in-flight LLM requests. Within a worker, concurrent
+# callers with the same fingerprint share one upstream call (or one upstream
+# stream). Across workers, an optional Postgres advisory lock elects a single
+# caller per fingerprint while the others wait for its result to appear in
+# the generation_cache table. Only the elected caller keeps a connection (from
+# lock_engine's small pool) for the length of its call; waiters check the lock
+# on short checkouts between polls.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, "_Broadcast"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Run `fn` once per key; every concurrent caller gets its result or its exception."""
+        task = self._calls.get(key)
+        if task is None:
+            # Own task so that a cancelled caller does not cancel the others
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish_call(key, t))
+        else:
+            metrics.inc("singleflight_coalesced")
+        return await asyncio.shield(task)
+
+    def _finish_call(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every caller went away
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Share one upstream stream: each subscriber replays it from the first chunk."""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(self._pump(key, broadcast, fn))
+        else:
+            metrics.inc("singleflight_coalesced")
+
+        broadcast.subscribers += 1
+        try:
+            async for chunk in broadcast.subscribe():
+                yield chunk
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers and not broadcast.done:
+                # Nobody is listening any more; later callers start afresh
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+                broadcast.task.cancel()
+
+    async def _pump(self, key: str, broadcast: "_Broadcast", fn: Callable[[], AsyncIterator[str]]):
+        try:
+            async with aclosing(fn()) as chunks:
+                async for chunk in chunks:
+                    broadcast.publish(chunk)
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            broadcast.finish()
+
+
+class _Broadcast:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+# ── Cross-worker coordination ────────────────────────────────
+
+def _lock_id(key: str) -> int:
+    """Map a hex fingerprint onto Postgres' signed 64-bit advisory lock space."""
+    return int.from_bytes(bytes.fromhex(key[:16]), "big", signed=True)
+
+
+def _try_lock(conn, lock_id: int) -> bool:
+    return conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar()
+
+
+def _unlock(conn, lock_id: int):
+    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+
+
+def _lock_connection():
+    """A connection to hold a lock on, or None when every one is in use."""
+    try:
+        return lock_engine.connect()
+    except exc.TimeoutError:
+        return None
+
+
+def _lock_free(lock_id: int) -> bool:
+    """Whether nobody holds the lock, checked on a short checkout."""
+    with engine.connect() as conn:
+        if not _try_lock(conn, lock_id):
+            return False
+        _unlock(conn, lock_id)
+        return True
+
+
+async def distributed(
+    key: str,
+    fn: Callable[[], Awaitable[str]],
+    lookup: Callable[[str], Awaitable[Optional[str]]],
+) -> str:
+    """Elect one caller per key across workers.
+
+    The lock holder runs `fn`, which must persist its result where `lookup`
+    finds it before returning. Everyone else polls `lookup`, and runs `fn`
+    itself only if the holder released the lock without leaving a result.
+    A caller that finds every lock connection busy runs `fn` uncoordinated.
+    """
+    lock_id = _lock_id(key)
+    loop = asyncio.get_running_loop()
+    conn = await asyncio.to_thread(_lock_connection)
+    if conn is None:
+        metrics.inc("singleflight_lock_pool_exhausted")
+        return await fn()
+    try:
+        if await asyncio.to_thread(_try_lock, conn, lock_id):
+            try:
+                # The previous holder may have finished just before we got the lock
+                result = await lookup(key)
+                return result if result is not None else await fn()
+            finally:
+                await asyncio.to_thread(_unlock, conn, lock_id)
+    finally:
+        await asyncio.to_thread(conn.close)
+
+    metrics.inc("singleflight_distributed_waits")
+    deadline = loop.time() + settings.SINGLEFLIGHT_WAIT_SECONDS
+    while loop.time() < deadline:
+        await asyncio.sleep(settings.SINGLEFLIGHT_POLL_SECONDS)
+        result = await lookup(key)
+        if result is not None:
+            return result
+        if await asyncio.to_thread(_lock_free, lock_id):
+            break  # holder gave up without a result
+    return await fn()
+
+
+llm_flight = SingleFlight()
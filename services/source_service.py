@@ -1,11 +1,23 @@
+import asyncio
+import hashlib
 import os
 import uuid
 from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple
+
+import aiofiles
 from fastapi import UploadFile, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, load_only
+from models.source_blob import SourceBlob
+from models.source_text import SourceText
 from models.study_source import StudySource
 from models.user import User
+from core import compression, metrics
 from core.config import settings
+from services import extraction, pool_service, text_normalizer
+from services.extraction import ExtractionCancelled, ExtractionError
 
 
 ALLOWED_TYPES = {
@@ -18,35 +30,129 @@ ALLOWED_TYPES = {
 }
 
 
-def _extract_text_from_pdf(file_path: str) -> str:
-    from langchain_community.document_loaders import PyPDFLoader
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
-    return "\n\n".join(doc.page_content for doc in docs)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def _store_upload(file: UploadFile, file_path: Path) -> Tuple[str, int]:
+    """Copy the upload to `file_path` in fixed-size chunks, hashing as it goes.
 
+    Writes go to a temp file next to the destination and are renamed into
+    place only once complete, so a partial upload is never visible. Aborts
+    as soon as MAX_UPLOAD_SIZE_MB is crossed. Returns (sha256 hex, size).
+    """
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = file_path.with_name(f".{file_path.name}.part")
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413, detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE_MB}MB"
+                    )
+                digest.update(chunk)
+                await out.write(chunk)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+    return digest.hexdigest(), size
 
-def _extract_text_from_docx(file_path: str) -> str:
-    from langchain_community.document_loaders import Docx2txtLoader
-    loader = Docx2txtLoader(file_path)
-    docs = loader.load()
-    return "\n\n".join(doc.page_content for doc in docs)
 
+def _claim_blob(db: Session, sha256: str) -> Optional[SourceBlob]:
+    """Take one more reference on an existing blob, or None if there is none."""
+    return db.execute(
+        update(SourceBlob)
+        .where(SourceBlob.sha256 == sha256)
+        .values(ref_count=SourceBlob.ref_count + 1)
+        .returning(SourceBlob)
+    ).scalar_one_or_none()
 
-def _extract_text_from_image(file_path: str) -> str:
+
+def _remove_file(path) -> None:
     try:
-        from langchain_community.document_loaders import UnstructuredImageLoader
-        loader = UnstructuredImageLoader(file_path)
-        docs = loader.load()
-        return "\n\n".join(doc.page_content for doc in docs)
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _create_blob(
+    db: Session, incoming: Path, sha256: str, size: int, source_type: str, file_ext: str,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+) -> SourceBlob:
+    """Extract text from a file not seen before and store it as a new blob."""
+    blob_dir = Path(settings.UPLOAD_DIR) / "blobs" / sha256[:2]
+    blob_dir.mkdir(parents=True, exist_ok=True)
+    # Unique per blob row, so a new blob never collides with a file whose
+    # last reference is being deleted concurrently
+    file_path = blob_dir / f"{sha256}-{uuid.uuid4().hex[:8]}{file_ext}"
+    os.replace(incoming, file_path)
+
+    # Extract text in the worker process pool
+    try:
+        raw_text = await extraction.run(source_type, str(file_path), is_disconnected)
+    except ExtractionCancelled:
+        _remove_file(file_path)
+        raise HTTPException(status_code=499, detail="Upload cancelled")
+    except ExtractionError as e:
+        _remove_file(file_path)
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception:
-        # fallback to pytesseract directly
-        import pytesseract
-        from PIL import Image
-        image = Image.open(file_path)
-        return pytesseract.image_to_string(image)
+        # Every backend for this type failed: the file is damaged or not what it claims to be
+        _remove_file(file_path)
+        raise HTTPException(
+            status_code=422, detail="Could not read this file. It may be damaged or in an unsupported format."
+        )
+
+    # Headers, footers, page numbers and broken hyphenation would otherwise
+    # eat into every prompt built from this source
+    normalized = await asyncio.to_thread(text_normalizer.normalize, raw_text)
+    metrics.inc("text_chars_extracted", normalized.original_chars)
+    metrics.inc("text_chars_normalized", len(normalized.text))
+    metrics.inc("text_boilerplate_lines_removed", normalized.removed_lines)
+    raw_text = normalized.text
 
+    if not raw_text or len(raw_text.strip()) < 50:
+        _remove_file(file_path)
+        raise HTTPException(status_code=422, detail="Could not extract enough text from the file. Please try a different file.")
 
-async def save_file_source(db: Session, user: User, file: UploadFile) -> StudySource:
+    # The same file may have been extracted concurrently; keep whichever row won
+    blob = db.execute(
+        insert(SourceBlob)
+        .values(
+            sha256=sha256,
+            source_type=source_type,
+            file_path=str(file_path),
+            size_bytes=size,
+            ref_count=1,
+        )
+        .on_conflict_do_update(
+            index_elements=[SourceBlob.sha256],
+            set_={"ref_count": SourceBlob.ref_count + 1},
+        )
+        .returning(SourceBlob)
+    ).scalar_one()
+    if blob.file_path != str(file_path):
+        _remove_file(file_path)
+        return blob
+
+    raw_text = raw_text[:settings.SOURCE_TEXT_MAX_CHARS]  # cap to avoid prompt bloat
+    codec, data = compression.compress(raw_text)
+    db.add(SourceText(blob_sha256=sha256, codec=codec, data=data, chars=len(raw_text)))
+    metrics.inc("source_text_bytes_raw", len(raw_text.encode("utf-8")))
+    metrics.inc("source_text_bytes_stored", len(data))
+    return blob
+
+
+async def save_file_source(
+    db: Session, user: User, file: UploadFile, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> StudySource:
+    """Store an upload as a StudySource. Files are deduplicated by SHA-256:
+    a file uploaded before (by anyone) shares the existing blob and skips
+    extraction."""
     content_type = file.content_type
     if content_type not in ALLOWED_TYPES:
         raise HTTPException(
@@ -57,47 +163,39 @@ async def save_file_source(db: Session, user: User, file: UploadFile) -> StudySo
     source_type = ALLOWED_TYPES[content_type]
 
     # Save file to disk
-    upload_dir = Path(settings.UPLOAD_DIR) / str(user.id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    incoming_dir = Path(settings.UPLOAD_DIR) / "incoming"
+    incoming_dir.mkdir(parents=True, exist_ok=True)
 
     file_ext = Path(file.filename).suffix
-    unique_name = f"{uuid.uuid4()}{file_ext}"
-    file_path = upload_dir / unique_name
-
-    content = await file.read()
-    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
-    if len(content) > max_bytes:
-        raise HTTPException(status_code=400, detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE_MB}MB")
-
-    with open(file_path, "wb") as f:
-        f.write(content)
-
-    # Extract text using LangChain
-    try:
-        if source_type == "pdf":
-            raw_text = _extract_text_from_pdf(str(file_path))
-        elif source_type == "docx":
-            raw_text = _extract_text_from_docx(str(file_path))
-        elif source_type == "image":
-            raw_text = _extract_text_from_image(str(file_path))
-        else:
-            raw_text = ""
-    except Exception as e:
-        raw_text = ""
+    incoming = incoming_dir / f"{uuid.uuid4()}{file_ext}"
+    sha256, size = await _store_upload(file, incoming)
 
-    if not raw_text or len(raw_text.strip()) < 50:
-        raise HTTPException(status_code=422, detail="Could not extract enough text from the file. Please try a different file.")
+    blob = _claim_blob(db, sha256)
+    deduplicated = blob is not None
+    if deduplicated:
+        _remove_file(incoming)
+        metrics.inc("uploads_deduplicated")
+    else:
+        try:
+            blob = await _create_blob(db, incoming, sha256, size, source_type, file_ext, is_disconnected)
+        except BaseException:
+            db.rollback()
+            _remove_file(incoming)
+            raise
 
     source = StudySource(
         user_id=user.id,
-        source_type=source_type,
+        source_type=blob.source_type,
         file_name=file.filename,
-        file_path=str(file_path),
-        raw_text=raw_text[:50000],  # cap at 50k chars to avoid prompt bloat
+        blob_sha256=blob.sha256,
     )
     db.add(source)
     db.commit()
     db.refresh(source)
+    # Pools are per source, so warming every re-upload of a file would repeat
+    # the whole batch of generations; these fill on first use instead
+    if not deduplicated:
+        pool_service.warm_source(source.id)
     return source
 
 
@@ -114,11 +212,21 @@ def save_topic_source(db: Session, user: User, topic: str) -> StudySource:
     db.add(source)
     db.commit()
     db.refresh(source)
+    pool_service.warm_source(source.id)
     return source
 
 
 def get_user_sources(db: Session, user: User):
-    return db.query(StudySource).filter(StudySource.user_id == user.id).order_by(StudySource.created_at.desc()).all()
+    """Sources for listings and pickers: only the columns those render."""
+    return (
+        db.query(StudySource)
+        .options(load_only(
+            StudySource.id, StudySource.source_type, StudySource.file_name, StudySource.topic, StudySource.created_at,
+        ))
+        .filter(StudySource.user_id == user.id)
+        .order_by(StudySource.created_at.desc())
+        .all()
+    )
 
 
 def delete_source(db: Session, user: User, source_id: str):
@@ -129,9 +237,26 @@ def delete_source(db: Session, user: User, source_id: str):
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    # Delete file if exists
-    if source.file_path and os.path.exists(source.file_path):
-        os.remove(source.file_path)
-
+    blob_sha256 = source.blob_sha256
     db.delete(source)
+    db.flush()
+
+    orphaned_path = None
+    if blob_sha256:
+        # The shared file goes away with its last reference
+        ref_count, blob_path = db.execute(
+            update(SourceBlob)
+            .where(SourceBlob.sha256 == blob_sha256)
+            .values(ref_count=SourceBlob.ref_count - 1)
+            .returning(SourceBlob.ref_count, SourceBlob.file_path)
+        ).one()
+        if ref_count <= 0:
+            db.execute(delete(SourceBlob).where(SourceBlob.sha256 == blob_sha256))
+            orphaned_path = blob_path
+    else:
+        orphaned_path = source.file_path
     db.commit()
+
+    # Delete file if exists
+    if orphaned_path:
+        _remove_file(orphaned_path)
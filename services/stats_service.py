@@ -0,0 +1,184 @@
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from db.base import SessionLocal
+from models.quiz_session import QuizSession
+from models.user_stats import UserStats, empty_stats
+
+# Per-user quiz statistics live in user_stats and are updated in the same
+# transaction as the change they count: count_quiz() when a session is
+# created (or dropped), record_result() when one is submitted. Pages read them
+# with one primary-key lookup. rebuild() recomputes them from quiz_sessions:
+#
+#     python -m services.stats_service rebuild [--user EMAIL]
+
+DEFAULT_DIFFICULTY = "medium"  # QuizSession.difficulty default
+
+# Recomputes user_stats from quiz_sessions, for every user or just :user_id.
+# Streaks are runs of consecutive UTC days with a finished quiz: within a run,
+# day minus its rank is constant.
+REBUILD_SQL = """
+WITH totals AS (
+    SELECT user_id, count(*) AS total_quizzes
+    FROM quiz_sessions
+    WHERE CAST(:user_id AS uuid) IS NULL OR user_id = CAST(:user_id AS uuid)
+    GROUP BY user_id
+),
+finished AS (
+    SELECT user_id, COALESCE(difficulty, 'medium') AS difficulty, COALESCE(percentage, 0) AS percentage,
+           (completed_at AT TIME ZONE 'UTC')::date AS day
+    FROM quiz_sessions
+    WHERE status IN ('completed', 'timed_out') AND completed_at IS NOT NULL
+      AND (CAST(:user_id AS uuid) IS NULL OR user_id = CAST(:user_id AS uuid))
+),
+results AS (
+    SELECT user_id, count(*) AS completed_quizzes, sum(percentage) AS percentage_sum,
+           max(percentage) AS best_percentage, max(day) AS last_completed_on
+    FROM finished
+    GROUP BY user_id
+),
+difficulties AS (
+    SELECT user_id, jsonb_object_agg(difficulty, jsonb_build_object('completed', n, 'percentage_sum', s))
+           AS by_difficulty
+    FROM (
+        SELECT user_id, difficulty, count(*) AS n, sum(percentage)::float8 AS s
+        FROM finished
+        GROUP BY user_id, difficulty
+    ) d
+    GROUP BY user_id
+),
+runs AS (
+    SELECT user_id, count(*) AS length, max(day) AS last_day
+    FROM (
+        SELECT user_id, day, day - (row_number() OVER (PARTITION BY user_id ORDER BY day))::int AS run
+        FROM (SELECT DISTINCT user_id, day FROM finished) days
+    ) r
+    GROUP BY user_id, run
+),
+streaks AS (
+    SELECT user_id, max(length) AS best_streak, (array_agg(length ORDER BY last_day DESC))[1] AS current_streak
+    FROM runs
+    GROUP BY user_id
+)
+INSERT INTO user_stats (user_id, total_quizzes, completed_quizzes, percentage_sum, best_percentage,
+                        current_streak, best_streak, last_completed_on, by_difficulty, updated_at)
+SELECT u.id, COALESCE(t.total_quizzes, 0), COALESCE(r.completed_quizzes, 0), COALESCE(r.percentage_sum, 0),
+       r.best_percentage, COALESCE(s.current_streak, 0), COALESCE(s.best_streak, 0), r.last_completed_on,
+       COALESCE(d.by_difficulty, '{}'::jsonb), now()
+FROM users u
+LEFT JOIN totals t ON t.user_id = u.id
+LEFT JOIN results r ON r.user_id = u.id
+LEFT JOIN difficulties d ON d.user_id = u.id
+LEFT JOIN streaks s ON s.user_id = u.id
+WHERE CAST(:user_id AS uuid) IS NULL OR u.id = CAST(:user_id AS uuid)
+ON CONFLICT (user_id) DO UPDATE SET
+    total_quizzes = excluded.total_quizzes,
+    completed_quizzes = excluded.completed_quizzes,
+    percentage_sum = excluded.percentage_sum,
+    best_percentage = excluded.best_percentage,
+    current_streak = excluded.current_streak,
+    best_streak = excluded.best_streak,
+    last_completed_on = excluded.last_completed_on,
+    by_difficulty = excluded.by_difficulty,
+    updated_at = excluded.updated_at
+"""
+
+
+def get_stats(db: Session, user_id: UUID) -> UserStats:
+    return db.get(UserStats, user_id) or empty_stats(user_id)
+
+
+def count_quiz(db: Session, user_id: UUID, delta: int = 1):
+    """Add `delta` to the user's quiz count, creating their row if needed."""
+    db.execute(
+        insert(UserStats)
+        .values(user_id=user_id, total_quizzes=max(delta, 0))
+        .on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={"total_quizzes": UserStats.total_quizzes + delta},
+        )
+    )
+
+
+def _locked_stats(db: Session, user_id: UUID) -> UserStats:
+    """The user's stats row, created if missing and locked until commit."""
+    upsert = (
+        insert(UserStats)
+        .values(user_id=user_id)
+        .on_conflict_do_update(index_elements=[UserStats.user_id], set_={"user_id": user_id})
+        .returning(UserStats)
+    )
+    return db.scalars(upsert, execution_options={"populate_existing": True}).one()
+
+
+def _apply_result(stats: UserStats, percentage: Decimal, difficulty: str, day: date):
+    stats.completed_quizzes += 1
+    stats.percentage_sum += percentage
+    if stats.best_percentage is None or percentage > stats.best_percentage:
+        stats.best_percentage = percentage
+
+    by_difficulty = dict(stats.by_difficulty or {})  # reassigned so the JSONB change is flushed
+    entry = by_difficulty.get(difficulty, {"completed": 0, "percentage_sum": 0})
+    by_difficulty[difficulty] = {
+        "completed": entry["completed"] + 1,
+        "percentage_sum": round(entry["percentage_sum"] + float(percentage), 2),
+    }
+    stats.by_difficulty = by_difficulty
+
+    if stats.last_completed_on != day:
+        continues = stats.last_completed_on == day - timedelta(days=1)
+        stats.current_streak = stats.current_streak + 1 if continues else 1
+        stats.best_streak = max(stats.best_streak, stats.current_streak)
+        stats.last_completed_on = day
+
+
+def record_result(db: Session, session: QuizSession):
+    """Count a just-submitted session. Call before the submit commits."""
+    stats = _locked_stats(db, session.user_id)
+    _apply_result(
+        stats,
+        Decimal(str(session.percentage or 0)),
+        session.difficulty or DEFAULT_DIFFICULTY,
+        session.completed_at.date(),
+    )
+
+
+def rebuild(db: Session, user_id: UUID = None) -> int:
+    """Recompute stats for one user or everyone; returns the rows written.
+
+    The EXCLUSIVE lock waits for in-flight submits and holds off new ones,
+    so none is lost between reading quiz_sessions and writing user_stats.
+    Reads of user_stats carry on.
+    """
+    db.execute(text("LOCK TABLE user_stats IN EXCLUSIVE MODE"))
+    written = db.execute(text(REBUILD_SQL), {"user_id": user_id}).rowcount
+    db.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the user_stats table.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", metavar="EMAIL", help="only this user (default: everyone)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_id = None
+        if args.user:
+            user_id = db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": args.user}).scalar()
+            if user_id is None:
+                parser.error(f"no user with email {args.user}")
+        print(f"Rebuilt stats for {rebuild(db, user_id)} user(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
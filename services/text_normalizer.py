@@ -0,0 +1,92 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import List, NamedTuple
+
+# Extracted text is cleaned once at ingestion, before it is stored, so the
+# prompt window and upstream tokens go to content rather than to running
+# headers, page numbers, broken hyphenation and whitespace.
+#
+# Pages are separated by form feeds (see extraction.PAGE_SEPARATOR). A line
+# near the top or bottom of a page is boilerplate when, with digits masked,
+# it shows up on at least REPEATED_LINE_MIN_SHARE of the pages.
+
+EDGE_LINES = 3  # lines at each end of a page that may be headers/footers
+REPEATED_LINE_MIN_PAGES = 3
+REPEATED_LINE_MIN_SHARE = 0.4  # running heads often alternate between odd and even pages
+
+_PAGE_NUMBER = re.compile(
+    r"^(?:page\s*)?(?:\d{1,4}|(?=[ivxlcdm])m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3}))"
+    r"(?:\s*(?:of|/)\s*\d{1,4})?$",
+    re.IGNORECASE,
+)
+_DIGITS = re.compile(r"\d+")
+_CONTROL = re.compile("[\x00-\x08\x0b\x0e-\x1f\x7f\u00ad\u200b-\u200d\ufeff\ufffd]")
+_LEADERS = re.compile(r"([._=*-])(?: ?\1){3,}")
+_HYPHEN_BREAK = re.compile(r"(?<=\w)-\n+(?=[a-z])")
+_SPACES = re.compile(r" [ \t]+|\t[ \t]*")
+_LINE_EDGES = re.compile(r" ?\n ?")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class NormalizedText(NamedTuple):
+    text: str
+    original_chars: int
+    removed_lines: int
+
+    @property
+    def ratio(self) -> float:
+        """Stored size as a share of the extracted size (lower is better)."""
+        return round(len(self.text) / self.original_chars, 4) if self.original_chars else 1.0
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS.sub("#", line.lower())
+
+
+def _edge_lines(lines: List[str]) -> List[str]:
+    content = [line for line in lines if line]
+    if len(content) <= 2 * EDGE_LINES:
+        return content
+    return content[:EDGE_LINES] + content[-EDGE_LINES:]
+
+
+def _strip_boilerplate(pages: List[List[str]]) -> int:
+    """Blank out repeated headers/footers and page numbers in place; returns
+    the number of lines removed."""
+    repeated = set()
+    if len(pages) >= REPEATED_LINE_MIN_PAGES:
+        counts = Counter()
+        for lines in pages:
+            counts.update({_line_key(line) for line in _edge_lines(lines)})
+        threshold = max(2, REPEATED_LINE_MIN_SHARE * len(pages))
+        repeated = {key for key, count in counts.items() if count >= threshold}
+
+    removed = 0
+    for lines in pages:
+        edges = set(_edge_lines(lines))
+        for i, line in enumerate(lines):
+            if line in edges and (_PAGE_NUMBER.match(line) or _line_key(line) in repeated):
+                lines[i] = ""
+                removed += 1
+    return removed
+
+
+def normalize(text: str) -> NormalizedText:
+    """Strip boilerplate and artifacts from extracted text."""
+    original_chars = len(text)
+    # NFKC folds ligatures, full-width forms and odd spaces to plain text
+    text = unicodedata.normalize("NFKC", text.replace("\r\n", "\n").replace("\r", "\n"))
+
+    text = _CONTROL.sub("", text)
+    text = _LEADERS.sub(" ", text)
+    text = _SPACES.sub(" ", text)
+    text = _LINE_EDGES.sub("\n", text)
+
+    pages = [page.split("\n") for page in text.split("\f")]
+    removed = _strip_boilerplate(pages)
+
+    text = "\n\n".join("\n".join(lines) for lines in pages)
+    text = _HYPHEN_BREAK.sub("", text)
+    text = _BLANK_LINES.sub("\n\n", text).strip()
+    return NormalizedText(text, original_chars, removed)
@@ -0,0 +1,52 @@
+import threading
+from typing import Optional
+
+from core.config import settings
+
+# Token counts use the generation model's own tokenizer (tokenizer.json from
+# the HuggingFace Hub, run by the Rust `tokenizers` library). If it cannot be
+# loaded — offline, gated model, package missing — counts fall back to a
+# ~4 characters per token estimate.
+
+_tokenizer = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def load():
+    """Load the tokenizer once; call at startup so no request pays for the download."""
+    global _tokenizer, _loaded
+    with _lock:
+        if _loaded:
+            return _tokenizer
+        try:
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+            path = hf_hub_download(
+                repo_id=settings.TOKENIZER_ID or settings.HF_MODEL_ID,
+                filename="tokenizer.json",
+                token=settings.HF_API_TOKEN,
+            )
+            _tokenizer = Tokenizer.from_file(path)
+        except Exception:
+            _tokenizer = None
+        _loaded = True
+        return _tokenizer
+
+
+def _get() -> Optional[object]:
+    return _tokenizer if _loaded else load()
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = _get()
+    if tokenizer is None:
+        return max(1, len(text) // 4)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens_batch(texts: list) -> list:
+    tokenizer = _get()
+    if tokenizer is None:
+        return [max(1, len(t) // 4) for t in texts]
+    return [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
@@ -4,6 +4,7 @@
  *  - Question navigation (prev/next/nav dots)
  *  - Answer selection and state tracking
  *  - AJAX quiz submission to backend
+ *  - Live mode: questions arrive over SSE while the quiz is still generating
  */
 
 let questions = [];
@@ -14,6 +15,8 @@ let answers = {};       // { question_id: 'A' | 'B' | 'C' | 'D' | null }
 let timerInterval = null;
 let secondsLeft = 0;
 let startTime = null;
+let generating = false;  // true while the SSE stream is still producing questions
+let submitWhenGenerated = false;  // time ran out mid-generation: submit on 'done'
 
 
 function initQuiz(qs, sid, limit) {
@@ -32,6 +35,82 @@ function initQuiz(qs, sid, limit) {
 }
 
 
+function initStreamingQuiz(streamUrl, limit) {
+  timeLimit = limit;
+  secondsLeft = limit;
+  generating = true;
+  document.getElementById('questionArea').innerHTML =
+    '<div class="q-generating">Generating your first question…</div>';
+  updateControls();
+
+  const source = new EventSource(streamUrl);
+
+  source.addEventListener('session', e => {
+    const s = JSON.parse(e.data);
+    sessionId = s.id;
+    document.getElementById('quizTitle').textContent = s.title;
+    // A reload should reopen this quiz, not generate a new one
+    history.replaceState(null, '', `/quiz/${s.id}/attempt`);
+  });
+
+  source.addEventListener('question', e => {
+    appendQuestion(JSON.parse(e.data));
+  });
+
+  source.addEventListener('done', () => {
+    source.close();
+    finishGenerating();
+  });
+
+  source.addEventListener('failed', e => {
+    source.close();
+    finishGenerating(JSON.parse(e.data).detail);
+  });
+
+  // Connection dropped: stop here instead of letting EventSource reconnect
+  // (a reconnect would start a new generation)
+  source.onerror = () => {
+    if (source.readyState !== EventSource.CLOSED) {
+      source.close();
+      finishGenerating(questions.length ? null : 'Connection lost while generating.');
+    }
+  };
+}
+
+function appendQuestion(q) {
+  questions.push(q);
+  answers[q.id] = null;
+  if (questions.length === 1) {
+    startTime = Date.now();
+    renderQuestion(0);
+    startTimer();
+  }
+  renderNavDots();
+  updateControls();
+  updateProgress();
+}
+
+function finishGenerating(error) {
+  generating = false;
+  document.getElementById('totalCount').textContent = questions.length;
+  if (submitWhenGenerated && questions.length) {
+    submitQuiz(true);
+    return;
+  }
+  if (!questions.length) {
+    clearInterval(timerInterval);
+    document.getElementById('questionArea').innerHTML = `
+      <div class="alert alert-error">${escapeHtml(error || 'No questions were generated.')}</div>
+      <a href="/quiz/generate" class="btn btn-primary">Back to Generate</a>
+    `;
+    document.querySelector('.quiz-controls').style.display = 'none';
+    return;
+  }
+  updateControls();
+  updateProgress();
+}
+
+
 /* ── Timer ───────────────────────────────────────────────── */
 function startTimer() {
   updateTimerDisplay();
@@ -103,16 +182,19 @@ function updateControls() {
 
   prev.disabled = currentIndex === 0;
 
-  if (currentIndex === questions.length - 1) {
+  if (currentIndex === questions.length - 1 && !generating) {
     next.style.display = 'none';
     submit.style.display = 'inline-flex';
   } else {
     next.style.display = 'inline-flex';
     submit.style.display = 'none';
+    // While generating, the next question may not have arrived yet
+    next.disabled = currentIndex >= questions.length - 1;
   }
 }
 
 function updateProgress() {
+  if (!questions.length) return;
   const answered = Object.values(answers).filter(v => v !== null).length;
   const pct = (answered / questions.length) * 100;
   document.getElementById('progressBar').style.width = pct + '%';
@@ -186,7 +268,14 @@ function closeModal() {
 }
 
 async function submitQuiz(isAutoSubmit = false) {
+  if (!sessionId || !questions.length) return;
   clearInterval(timerInterval);
+  // The server only accepts a submit once the quiz has all its questions
+  if (generating) {
+    submitWhenGenerated = true;
+    document.getElementById('confirmModal').classList.add('hidden');
+    return;
+  }
   document.getElementById('confirmModal').classList.add('hidden');
 
   const timeTaken = Math.round((Date.now() - startTime) / 1000);